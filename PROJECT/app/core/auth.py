@@ -1,13 +1,19 @@
 from jose import jwt, JWTError
 from fastapi import HTTPException, Depends,status
 from passlib.context import CryptContext
+from sqlalchemy import select, event
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
 from datetime import datetime, timedelta
 # from fastapi.security import OAuth2PasswordBearer
-from typing import Optional
+from typing import Optional, NamedTuple
 from app.models.user import User
 from app.models.owner import Owner
-from app.core.db import get_db
+from app.core.db import get_db, get_read_db
+from app.utils.cache import TTLCache
 from typing import Dict
 from datetime import datetime, timedelta
 
@@ -17,7 +23,16 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
 # Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# bcrypt releases the GIL, so a small dedicated thread pool keeps it off the event loop
+# and out of the shared threadpool. PASSWORD_HASH_QUEUE caps running + waiting jobs;
+# beyond that login/register answer 503 instead of piling up.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_password_jobs = 0
 
 def hash_password(password: str) -> str:
     """Hash a plain text password."""
@@ -26,7 +41,37 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
     return pwd_context.verify(plain_password, hashed_password)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def _release_password_job(future) -> None:
+    global _password_jobs
+    _password_jobs -= 1
+    if not future.cancelled():
+        future.exception()  # retrieved, so a job nobody waits for any more is not logged as unhandled
+
+
+async def _run_password_job(func, *args):
+    global _password_jobs
+    if _password_jobs >= PASSWORD_HASH_QUEUE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress, please retry",
+            headers={"Retry-After": "1"},
+        )
+    _password_jobs += 1
+    future = asyncio.get_running_loop().run_in_executor(_password_executor, func, *args)
+    # The slot is freed when the job itself finishes: a request cancelled while waiting (client
+    # gone) leaves its hash running or queued in the executor, and it still counts. shield()
+    # keeps that cancellation from marking the job done early.
+    future.add_done_callback(_release_password_job)
+    return await asyncio.shield(future)
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the password worker pool."""
+    return await _run_password_job(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the password worker pool."""
+    return await _run_password_job(verify_password, plain_password, hashed_password)
 
 # Token creation
 def create_access_token(data: Dict[str, str], expires_delta: Optional[timedelta] = None):
@@ -36,31 +81,31 @@ def create_access_token(data: Dict[str, str], expires_delta: Optional[timedelta]
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 # Token verification
-def verify_token(token: str, db: Session) -> User:
+async def verify_token(token: str, db: AsyncSession) -> User:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username = payload.get("sub")
         if username is None:
             raise HTTPException(status_code=401, detail="Invalid token")
-        user = db.query(User).filter(User.username == username).first()
+        user = await db.scalar(select(User).where(User.username == username))
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         return user
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-def authenticate_user(username: str, password: str, db: Session):
+async def authenticate_user(username: str, password: str, db: AsyncSession):
     """
     Authenticate a user by verifying their username and password.
     """
-    user = db.query(User).filter(User.username == username).first()
-    if user and pwd_context.verify(password, user.password):  # Verify password
+    user = await db.scalar(select(User).where(User.username == username))
+    if user and await verify_password_async(password, user.password):  # Verify password
         return user
     return None
 
-def authenticate_owner(db: Session, ownername: str, password: str):
-    owner = db.query(Owner).filter(Owner.ownername == ownername).first()
-    if owner and verify_password(password, owner.password):
+async def authenticate_owner(db: AsyncSession, ownername: str, password: str):
+    owner = await db.scalar(select(Owner).where(Owner.ownername == ownername))
+    if owner and await verify_password_async(password, owner.password):
         return owner  # Return the owner if credentials are valid
     return None
 
@@ -84,44 +129,134 @@ def decode_access_token(token: str) -> dict:
         )
 
 
-def get_current_user(token: str, db: Session = Depends(get_db)):
-    try:
-        payload = decode_access_token(token)
-        username = payload.get("sub")
-        if username is None:
+class Principal(NamedTuple):
+    """Authenticated caller built from the token claims, no database row attached."""
+    id: int
+    name: str
+    role: str
+
+
+# Optional cache of full user/owner rows for endpoints that need more than the claims
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))  # seconds, 0 disables
+principal_cache = TTLCache(maxsize=4096, ttl=PRINCIPAL_CACHE_TTL)
+# Deleted accounts whose tokens may still be in circulation
+revoked_principals = TTLCache(maxsize=65536, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+PRINCIPAL_ROLES = {User: "user", Owner: "owner"}
+
+
+def invalidate_principal(role: str, principal_id: int) -> None:
+    """Drop a cached principal and reject its outstanding tokens, e.g. once its deletion has committed."""
+    principal_cache.pop((role, principal_id))
+    revoked_principals.set((role, principal_id), True)
+
+
+# Accounts are revoked when the transaction deleting them commits, not when the delete is
+# flushed: a delete that is rolled back afterwards must leave the tokens working.
+# Both caches are per worker: only the worker that committed the delete learns of it. Every
+# other worker keeps accepting the account's tokens until they expire (ACCESS_TOKEN_EXPIRE_MINUTES)
+# and serving its cached row for up to PRINCIPAL_CACHE_TTL. No endpoint deletes accounts today;
+# one that does needs a shared revocation list (e.g. in the RESPONSE_CACHE_URL Redis).
+@event.listens_for(Session, "after_flush")
+def _collect_deleted_principals(session, flush_context):
+    for obj in session.deleted:
+        role = PRINCIPAL_ROLES.get(type(obj))
+        if role:
+            session.info.setdefault("deleted_principals", []).append((role, obj.id))
+
+
+@event.listens_for(Session, "after_commit")
+def _revoke_deleted_principals(session):
+    for role, principal_id in session.info.pop("deleted_principals", []):
+        invalidate_principal(role, principal_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_deleted_principals(session):
+    session.info.pop("deleted_principals", None)
+
+
+async def _principal_from_token(token: str, role: str, model, name_column, db: AsyncSession) -> Principal:
+    payload = decode_access_token(token)
+    name = payload.get("sub")
+    if not name:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token - Missing 'sub'",
+        )
+
+    # Fast path: the token already carries the id and role, no query needed
+    if payload.get("uid") is not None:
+        if payload.get("role") != role:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token",
+                detail="Invalid token for this resource",
             )
-        user = db.query(User).filter(User.username == username).first()
-        if user is None:
+        if revoked_principals.get((role, payload["uid"])):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found",
+                detail=f"{role.capitalize()} not found",
             )
-        return user
-    except JWTError:
+        return Principal(id=payload["uid"], name=name, role=role)
+
+    # Tokens issued before the id claim existed still need the lookup
+    row = await db.scalar(select(model).where(name_column == name))
+    if row is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid credentials",
+            detail=f"{role.capitalize()} not found",
         )
+    return Principal(id=row.id, name=name, role=role)
+
+
+async def _load_principal_row(principal: Principal, model, db: AsyncSession):
+    key = (principal.role, principal.id)
+    row = principal_cache.get(key) if PRINCIPAL_CACHE_TTL > 0 else None
+    if row is None:
+        row = await db.get(model, principal.id)
+        if row is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=f"{principal.role.capitalize()} not found",
+            )
+        if PRINCIPAL_CACHE_TTL > 0:
+            # Detach so the cached row can outlive this request's session
+            db.expunge(row)
+            principal_cache.set(key, row)
+    return row
+
+
+async def get_current_user(token: str, db: AsyncSession = Depends(get_read_db)) -> Principal:
+    return await _principal_from_token(token, "user", User, User.username, db)
+
 
 # Get current owner
-def get_current_owner(token: str, db: Session = Depends(get_db)) -> Owner:
-    payload = decode_access_token(token)
-    ownername = payload.get("sub")
-    print(f"Ownername from token: {ownername}")  # Debugging line
-    if not ownername:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token - Missing 'sub'",
-        )
+async def get_current_owner(token: str, db: AsyncSession = Depends(get_read_db)) -> Principal:
+    return await _principal_from_token(token, "owner", Owner, Owner.ownername, db)
+
 
-    owner = db.query(Owner).filter(Owner.ownername == ownername).first()
-    if not owner:
+# Owners allowed to change store-wide settings such as the holiday calendar (comma-separated
+# owner ids). Anyone can register as an owner, so owner auth alone is not enough for these.
+ADMIN_OWNER_IDS = {int(owner_id) for owner_id in os.getenv("ADMIN_OWNER_IDS", "").split(",") if owner_id.strip()}
+
+
+async def get_current_admin(current_owner: Principal = Depends(get_current_owner)) -> Principal:
+    if current_owner.id not in ADMIN_OWNER_IDS:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Owner not found",
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can do this.",
         )
+    return current_owner
+
+
+async def get_current_user_row(
+    principal: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)
+) -> User:
+    """Full (detached) User row for endpoints that need more than the token claims."""
+    return await _load_principal_row(principal, User, db)
+
 
-    return owner
\ No newline at end of file
+async def get_current_owner_row(
+    principal: Principal = Depends(get_current_owner), db: AsyncSession = Depends(get_db)
+) -> Owner:
+    """Full (detached) Owner row for endpoints that need more than the token claims."""
+    return await _load_principal_row(principal, Owner, db)
@@ -1,7 +1,18 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc, text, make_url
 from sqlalchemy.orm import sessionmaker, declarative_base  # Updated import
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import os
+import time
+import asyncio
+import itertools
+import logging
+from alembic.config import Config
+from alembic.script import ScriptDirectory
 from dotenv import load_dotenv
+from app.utils.metrics import (
+    current_request_stats, db_queries_total, db_query_duration_seconds, db_pool_checkout_seconds,
+)
 
 # Load environment variables from a .env file
 load_dotenv()  # This loads the variables from the .env file
@@ -13,18 +24,301 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 #     raise ValueError("DATABASE_URL not found in .env file")
 
 
+def to_async_url(url: str) -> str:
+    """Swap the sync driver in a database URL for its asyncio counterpart."""
+    if url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url[len("postgresql+psycopg2://"):]
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+# The API talks to the database through the async engine; override the driver with
+# ASYNC_DATABASE_URL if the default asyncpg mapping of DATABASE_URL does not fit.
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+
+def env_flag(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+# Connection pool settings, size them against the number of uvicorn workers:
+# every worker process holds up to DB_POOL_SIZE + DB_MAX_OVERFLOW connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds, -1 disables recycling
+DB_POOL_PRE_PING = env_flag("DB_POOL_PRE_PING", "true")  # drop stale connections after a failover
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+
 # Create the database engine
-# engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-engine = create_engine(DATABASE_URL)
+# Sync engine - only used by Alembic and standalone scripts, never inside a request
+engine = create_engine(DATABASE_URL, **POOL_OPTIONS)
 # SessionLocal to interact with the database
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    The API pool: times every checkout and counts the ones that found all DB_POOL_SIZE +
+    DB_MAX_OVERFLOW connections busy and had to queue for one (see pool_counters below).
+    """
+
+    waiting = 0  # checkouts queued right now
+    _getting = 0  # checkouts in progress
+
+    def _do_get(self):
+        start = time.perf_counter()
+        # The asyncio queue yields even when a connection is idle, so every checkout still in
+        # progress has a claim on one of the idle connections
+        exhausted = self.checkedin() <= self._getting and -1 < self._max_overflow <= self.overflow()
+        self._getting += 1
+        if exhausted:
+            pool_counters["waits"] += 1
+            self.waiting += 1
+        try:
+            return super()._do_get()
+        finally:
+            self._getting -= 1
+            if exhausted:
+                self.waiting -= 1
+            db_pool_checkout_seconds.observe(time.perf_counter() - start)
+
+
+def create_api_engine(url: str, poolclass=AsyncAdaptedQueuePool):
+    # Always pass the pool class: aiosqlite defaults to NullPool, and the SQLite stand-in
+    # needs a real pool so the settings apply
+    return create_async_engine(url, **POOL_OPTIONS, poolclass=poolclass)
+
+
+# Async engine and sessions used by the routers.
+# Objects keep their state after commit: ids and defaults come back with the INSERT (RETURNING),
+# so routes answer from memory instead of re-reading every row they just wrote.
+async_engine = create_api_engine(ASYNC_DATABASE_URL, poolclass=TimedQueuePool)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+# Optional read replicas (comma-separated DATABASE_REPLICA_URLS). Read-only route dependencies
+# (get_read_db) go round-robin to the replicas that passed their last health check and are at
+# most REPLICA_MAX_LAG seconds behind; with none available they fall back to the primary.
+# Writes, and reads that must see the request's own writes, use get_db (always the primary).
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))  # seconds
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "10"))  # seconds between health checks
+REPLICA_CHECK_TIMEOUT = 2.0  # seconds before a check counts as failed
+# How far behind the primary a replica read can be: the lag limit, plus what a replica can
+# fall behind between two checks
+REPLICA_STALENESS = REPLICA_MAX_LAG + REPLICA_CHECK_INTERVAL
+
+# Replay delay on a Postgres standby; 0 when it has replayed everything it received
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class Replica:
+    """One read replica: its engine and the outcome of the last health check."""
+
+    def __init__(self, url: str):
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.engine = create_api_engine(to_async_url(url))
+        self.healthy = False  # until the first check passes
+        self.lag = None
+        self.error = None
+
+    async def _probe(self):
+        async with self.engine.connect() as conn:
+            if self.engine.dialect.name == "postgresql":
+                return await conn.scalar(REPLICA_LAG_QUERY)
+            await conn.execute(text("SELECT 1"))
+            return 0
+
+    async def check(self) -> None:
+        try:
+            # Connecting is covered too, a replica that hangs on connect must not stall the checks
+            lag = await asyncio.wait_for(self._probe(), REPLICA_CHECK_TIMEOUT)
+        except Exception as e:
+            self.healthy, self.lag, self.error = False, None, repr(e)
+            return
+        self.lag = float(lag or 0)
+        self.healthy = self.lag <= REPLICA_MAX_LAG
+        self.error = None if self.healthy else f"lag {self.lag:.1f}s over REPLICA_MAX_LAG"
+
+
+replicas = [Replica(url) for url in DATABASE_REPLICA_URLS]
+_replica_turn = itertools.count()
+
+
+def choose_replica():
+    """Next healthy replica in round-robin order, or None to read from the primary."""
+    candidates = [replica for replica in replicas if replica.healthy]
+    if not candidates:
+        return None
+    return candidates[next(_replica_turn) % len(candidates)]
+
+
+async def check_replicas() -> None:
+    await asyncio.gather(*(replica.check() for replica in replicas))
+
+
+async def monitor_replicas() -> None:
+    """Background task started with the app: re-check every replica every REPLICA_CHECK_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(REPLICA_CHECK_INTERVAL)
+        await check_replicas()
+
+
+def reads_from_replica(db: AsyncSession) -> bool:
+    """Whether a session from get_read_db was handed a replica rather than the primary."""
+    return db.bind is not async_engine
+
+
+def replica_status() -> list:
+    return [
+        {"replica": replica.name, "healthy": replica.healthy, "lag": replica.lag, "error": replica.error}
+        for replica in replicas
+    ]
+
+
+# Pool counters for the API engine. "overflow_checkouts" counts checkouts made while
+# DB_POOL_SIZE connections were busy, which opens overflow connections but does not wait yet.
+# Requests queue only once DB_MAX_OVERFLOW is used up as well: "waits" counts those
+# checkouts (db_pool_checkout_seconds has how long they took), and "timeouts" the
+# requests that gave up after DB_POOL_TIMEOUT.
+pool_counters = {
+    "connects": 0,
+    "checkouts": 0,
+    "checkins": 0,
+    "overflow_checkouts": 0,
+    "waits": 0,
+    "invalidations": 0,
+    "timeouts": 0,
+}
+
+
+@event.listens_for(async_engine.sync_engine.pool, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_counters["connects"] += 1
+
+
+@event.listens_for(async_engine.sync_engine.pool, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_counters["checkouts"] += 1
+    if async_engine.sync_engine.pool.overflow() > 0:
+        pool_counters["overflow_checkouts"] += 1
+
+
+@event.listens_for(async_engine.sync_engine.pool, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    pool_counters["checkins"] += 1
+
+
+@event.listens_for(async_engine.sync_engine.pool, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_counters["invalidations"] += 1
+
+
+# Statement counts and timings, in total and for the request being served (see /metrics)
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    db_queries_total.inc()
+    db_query_duration_seconds.observe(elapsed)
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        if stats.statements is not None:
+            stats.statements[(statement, repr(parameters))] += 1
+
+
+for _engine in [async_engine] + [replica.engine for replica in replicas]:
+    event.listen(_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def pool_status() -> dict:
+    """Snapshot of the API connection pool: configuration, live usage and counters."""
+    pool = async_engine.sync_engine.pool
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pre_ping": DB_POOL_PRE_PING,
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "waiting": pool.waiting,
+        **pool_counters,
+    }
 
 # Base class for models
 Base = declarative_base()  # Updated to use sqlalchemy.orm.declarative_base
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "alembic.ini")
+logger = logging.getLogger(__name__)
+
+
+async def check_schema_revision() -> None:
+    """
+    Compare the database's Alembic revision with the newest migration shipped with the code.
+    Costs a single query; refuses to start when migrations are still pending.
+    """
+    script = ScriptDirectory.from_config(Config(ALEMBIC_INI))
+    head = script.get_current_head()
+    async with async_engine.connect() as conn:
+        try:
+            current = await conn.scalar(text("SELECT version_num FROM alembic_version"))
+        except exc.DBAPIError:
+            current = None
+    if current == head:
+        return
+    if current is not None and current not in {rev.revision for rev in script.walk_revisions()}:
+        # Migrated by a newer release (e.g. mid rolling deploy); this code still runs on it
+        logger.warning("Database schema revision %s is newer than this release (%s)", current, head)
+        return
+    await async_engine.dispose()
+    raise RuntimeError(
+        f"Database schema is at revision {current}, expected {head}; run `alembic upgrade head`."
+    )
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except exc.TimeoutError:
+            # Pool exhausted for longer than DB_POOL_TIMEOUT
+            pool_counters["timeouts"] += 1
+            raise
+
+
+async def get_read_db():
+    """Session for read-only routes: a healthy replica when configured, otherwise the primary."""
+    replica = choose_replica()
+    async with AsyncSessionLocal(bind=replica.engine if replica else async_engine) as db:
+        try:
+            yield db
+        except exc.TimeoutError:
+            if replica is None:
+                pool_counters["timeouts"] += 1
+            raise
+        except (exc.OperationalError, exc.InterfaceError):
+            # Lost the replica; leave it out until the next health check passes
+            if replica is not None:
+                replica.healthy = False
+            raise
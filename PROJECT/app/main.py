@@ -1,12 +1,30 @@
 from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.requests import Request
 import os
-from app.routes import user, order, offer, product,owner
-from app.core.db import engine
-from app.models import user as user_model, order as order_model, offer as offer_model, product as product_model,owner as owner_model
+import time
+import asyncio
+from app.routes import user, order, offer, product,owner, holiday
+from app.core.db import (
+    async_engine, pool_status, pool_counters, check_schema_revision,
+    replicas, check_replicas, monitor_replicas, replica_status,
+)
+from app.core.auth import principal_cache
+from app.utils.helpers import offer_cache
+from app.utils.response_cache import response_cache
+from app.utils.singleflight import FLIGHTS
+from app.utils.query_budget import query_budget_enabled, check_query_budget
+from app.utils.holidays import load_holidays, refresh_holidays_periodically
+from app.utils.metrics import (
+    Counter, Gauge, RequestStats, current_request_stats, render_metrics,
+    http_requests_total, http_request_duration_seconds, http_requests_in_progress,
+    http_request_db_queries, http_request_db_seconds,
+)
+# Only registers every mapper, so relationships between models resolve (the schema itself is
+# managed by Alembic)
+from app.models import user as user_model, order as order_model, offer as offer_model, product as product_model,owner as owner_model, idempotency as idempotency_model, holiday as holiday_model, sales as sales_model  # noqa: F401
 
 # Initialize the FastAPI app
 app = FastAPI()
@@ -23,21 +41,123 @@ async def home(request: Request):
 
 
 
+# Per-route latency, status counts and database work for every request (see /metrics)
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    stats = RequestStats(track_statements=query_budget_enabled())
+    current_request_stats.set(stats)
+    http_requests_in_progress.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        if stats.statements is not None:
+            # SQL_QUERY_BUDGET is set (tests / staging): report N+1 patterns and over-budget routes
+            route = request.scope.get("route")
+            error = check_query_budget(stats, f"{request.method} {route.path if route else request.url.path}")
+            if error:
+                response = JSONResponse(status_code=500, content={"detail": error})
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        http_requests_in_progress.dec()
+        # Label by route template, not the raw path, to keep the number of series bounded
+        route = request.scope.get("route")
+        labels = {"method": request.method, "route": route.path if route else "unmatched"}
+        http_requests_total.inc(status=status, **labels)
+        http_request_duration_seconds.observe(elapsed, **labels)
+        http_request_db_queries.observe(stats.queries, **labels)
+        http_request_db_seconds.observe(stats.db_seconds, **labels)
+
+
 # Register routes
 app.include_router(user.router, prefix="/user", tags=["User"])
 app.include_router(order.router, prefix="/order", tags=["Order"])
 app.include_router(owner.router,prefix="/owner",tags=["Owner"])
 app.include_router(offer.router, prefix="/offer", tags=["Offer"])
 app.include_router(product.router, prefix="/product", tags=["Product"])
-
-# Create database tables if they do not exist
+app.include_router(holiday.router, prefix="/holiday", tags=["Holiday"])
+
+# Connection pool usage, used to size DB_POOL_SIZE / DB_MAX_OVERFLOW against the worker count
+@app.get("/health/pool")
+async def get_pool_status():
+    return pool_status()
+
+# Read replicas: last health check, replication lag and whether reads are sent there
+@app.get("/health/replicas")
+async def get_replica_status():
+    return replica_status()
+
+# Hit/miss counters of the in-process caches, and how many reads were coalesced
+@app.get("/health/caches")
+async def get_cache_stats():
+    return {
+        "offers": offer_cache.stats(),
+        "principals": principal_cache.stats(),
+        "responses": response_cache.stats(),
+        "singleflight": {flight.name: flight.stats() for flight in FLIGHTS},
+    }
+
+# Pool and cache figures, read when /metrics is scraped
+Gauge(
+    "db_pool_connections", "API connection pool connections, by state.", ("state",),
+    function=lambda: {(state,): pool_status()[state] for state in ("checked_in", "checked_out", "overflow")},
+)
+Gauge(
+    "db_pool_waiting", "Requests currently queued for an API pool connection.",
+    function=lambda: {(): pool_status()["waiting"]},
+)
+Counter(
+    "db_pool_events_total", "API connection pool events.", ("event",),
+    function=lambda: {(event,): count for event, count in pool_counters.items()},
+)
+Gauge(
+    "db_replica_healthy", "1 while a read replica passes its health and lag checks.", ("replica",),
+    function=lambda: {(replica.name,): int(replica.healthy) for replica in replicas},
+)
+Gauge(
+    "db_replica_lag_seconds", "Replication lag of a read replica at its last check.", ("replica",),
+    function=lambda: {(replica.name,): replica.lag for replica in replicas if replica.lag is not None},
+)
+CACHES = {"offers": offer_cache, "principals": principal_cache, "responses": response_cache}
+Counter(
+    "cache_hits_total", "In-process cache hits.", ("cache",),
+    function=lambda: {(name,): cache.stats()["hits"] for name, cache in CACHES.items()},
+)
+Counter(
+    "cache_misses_total", "In-process cache misses.", ("cache",),
+    function=lambda: {(name,): cache.stats()["misses"] for name, cache in CACHES.items()},
+)
+Gauge(
+    "cache_entries", "Entries held by the in-process caches.", ("cache",),
+    function=lambda: {(name,): cache.stats()["size"] for name, cache in CACHES.items() if "size" in cache.stats()},
+)
+
+# Prometheus scrape endpoint
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Tables are managed by Alembic (`alembic upgrade head`); startup only checks the revision
 @app.on_event("startup")
 async def startup():
-    user_model.Base.metadata.create_all(bind=engine)
-    owner_model.Base.metadata.create_all(bind=engine)
-    order_model.Base.metadata.create_all(bind=engine)
-    offer_model.Base.metadata.create_all(bind=engine)
-    product_model.Base.metadata.create_all(bind=engine)
+    await check_schema_revision()
+    # Holiday calendar in memory, reloaded in the background
+    await load_holidays()
+    app.state.holiday_refresh = asyncio.create_task(refresh_holidays_periodically())
+    # Read replicas are only used once they pass a check
+    await check_replicas()
+    app.state.replica_monitor = asyncio.create_task(monitor_replicas())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.holiday_refresh.cancel()
+    app.state.replica_monitor.cancel()
+    await async_engine.dispose()
+    for replica in replicas:
+        await replica.engine.dispose()
 
 
 # Serve the index.html file when the root URL is accessed
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, Date, UniqueConstraint
+from app.core.db import Base
+
+
+class Holiday(Base):
+    """A date on which no orders are taken, per region (store)."""
+    __tablename__ = "holidays"
+
+    id = Column(Integer, primary_key=True, index=True)
+    region = Column(String(32), nullable=False)
+    date = Column(Date, nullable=False)
+    name = Column(String, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("region", "date", name="uq_holidays_region_date"),
+    )
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, UniqueConstraint
+from app.core.db import Base
+from datetime import datetime
+
+
+class IdempotencyKey(Base):
+    """Stored response of a request sent with an Idempotency-Key header, replayed on retries."""
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    key = Column(String(255), nullable=False)
+    fingerprint = Column(String(64), nullable=False)  # sha256 of the request, a reused key must match
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_id_key"),
+    )
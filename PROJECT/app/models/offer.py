@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, DateTime, Boolean, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.core.db import Base
 from datetime import datetime
@@ -8,7 +8,7 @@ class Offer(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     code = Column(String, unique=True, nullable=False)
-    discount_value = Column(Float, nullable=False)  # Flat discount amount or percentage
+    discount_value = Column(Numeric(12, 2), nullable=False)  # Flat discount amount or percentage
     is_percentage = Column(Boolean, nullable=False)  # True if percentage, False if flat
     expiry_date = Column(DateTime, nullable=False)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=True)  # Optional, for product-specific offers
@@ -18,3 +18,17 @@ class Offer(Base):
     owner_id = Column(Integer, ForeignKey("owners.id"))
     owner = relationship("Owner", back_populates="offers")
 
+
+class OfferRedemption(Base):
+    """One row per offer a user has claimed; the unique key makes a second claim fail."""
+    __tablename__ = "offer_redemptions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    offer_id = Column(Integer, ForeignKey("offers.id", ondelete="CASCADE"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "offer_id", name="uq_offer_redemptions_user_id_offer_id"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.core.db import Base
 from datetime import datetime
@@ -11,10 +11,38 @@ class Order(Base):
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     quantity = Column(Integer, nullable=False)
     offer_code = Column(String, nullable=True)
-    total_amount = Column(Float, nullable=False)
-    discount_amount = Column(Float, nullable=True, default=0.0)
-    final_amount = Column(Float, nullable=False)
+    # Money columns are exact decimals, see app/utils/pricing.py
+    total_amount = Column(Numeric(12, 2), nullable=False)
+    discount_amount = Column(Numeric(12, 2), nullable=True, default=0)
+    final_amount = Column(Numeric(12, 2), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="orders")
+    # First product of the order; every product in it is listed in `items`
+    product = relationship("Product")
+    items = relationship(
+        "OrderItem",
+        back_populates="order",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="OrderItem.id",
+    )
+
+    __table_args__ = (
+        # Order history: a user's orders newest first, keyset-paginated on (created_at, id)
+        Index("ix_orders_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+
+
+class OrderItem(Base):
+    __tablename__ = "order_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    unit_price = Column(Numeric(12, 2), nullable=False)  # Price at the time the line was added
+    line_total = Column(Numeric(12, 2), nullable=False)
+
+    order = relationship("Order", back_populates="items")
     product = relationship("Product")
@@ -1,13 +1,14 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, Index, DateTime, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.core.db import Base
+from datetime import datetime
 
 class Product(Base):
     __tablename__ = "products"
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    price = Column(Float, nullable=False)
+    price = Column(Numeric(12, 2), nullable=False)
     stock = Column(Integer, nullable=False)
     owner_id = Column(Integer, ForeignKey("owners.id"),nullable=False)# Foreign key to Owner
     
@@ -15,3 +16,27 @@ class Product(Base):
     owner = relationship("Owner", back_populates="products")
     offers = relationship("Offer", back_populates="product")
     orders = relationship("Order", back_populates="product")
+
+    __table_args__ = (
+        # Keyset pagination: per-owner listings by id, and the catalogue by name
+        Index("ix_products_owner_id_id", "owner_id", "id"),
+        Index("ix_products_name_id", "name", "id"),
+        # An owner's product is identified by its name: enforced for add_product, conflict target for imports
+        UniqueConstraint("owner_id", "name", name="uq_products_owner_id_name"),
+    )
+
+
+class ProductImport(Base):
+    """Progress and outcome of one bulk product upload."""
+    __tablename__ = "product_imports"
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("owners.id"), nullable=False, index=True)
+    format = Column(String, nullable=False)  # "csv" or "ndjson"
+    status = Column(String, nullable=False, default="running")  # running, completed or failed
+    rows_read = Column(Integer, nullable=False, default=0)
+    rows_imported = Column(Integer, nullable=False, default=0)
+    rows_rejected = Column(Integer, nullable=False, default=0)
+    errors = Column(Text, nullable=True)  # JSON list of the first rejected rows
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
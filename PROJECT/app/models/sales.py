@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, Numeric, ForeignKey, Date, UniqueConstraint
+from app.core.db import Base
+
+
+class ProductSalesDaily(Base):
+    """
+    Sales of one product on one day (the order's created_at, UTC), kept up to date by the
+    order endpoints in the same transaction as the order. Rebuild with `python -m app.utils.sales`.
+    """
+    __tablename__ = "product_sales_daily"
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    day = Column(Date, nullable=False)
+    orders = Column(Integer, nullable=False, default=0)  # orders containing the product
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Numeric(14, 2), nullable=False, default=0)  # paid, after discount
+    discount = Column(Numeric(14, 2), nullable=False, default=0)  # discount given on the product's lines
+
+    __table_args__ = (
+        # One row per product and day; the incremental upserts conflict on it
+        UniqueConstraint("product_id", "day", name="uq_product_sales_daily_product_id_day"),
+    )
@@ -0,0 +1,74 @@
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy import select, extract
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.holiday import Holiday
+from app.schemas.holiday import HolidayCreate, HolidayResponse
+from app.core.db import get_db
+from app.core.auth import get_current_owner, get_current_admin, Principal
+from app.utils.holidays import load_holidays, HOLIDAY_REGION
+from typing import List, Optional
+
+router = APIRouter()
+
+
+# List holidays
+@router.get("/holidays", response_model=List[HolidayResponse])
+async def list_holidays(
+    region: str = HOLIDAY_REGION,
+    year: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    current_owner: Principal = Depends(get_current_owner),
+):
+    """Lists the holidays of a region, optionally for one year."""
+    query = select(Holiday).where(Holiday.region == region)
+    if year is not None:
+        query = query.where(extract("year", Holiday.date) == year)
+    return (await db.scalars(query.order_by(Holiday.date))).all()
+
+
+# Add a holiday
+@router.post("/holidays", response_model=HolidayResponse)
+async def add_holiday(
+    holiday_data: HolidayCreate,
+    db: AsyncSession = Depends(get_db),
+    current_admin: Principal = Depends(get_current_admin),
+):
+    """Adds a holiday; orders are refused on it from the next calendar reload (immediately on this worker)."""
+    holiday = Holiday(
+        region=holiday_data.region or HOLIDAY_REGION,
+        date=holiday_data.date,
+        name=holiday_data.name,
+    )
+    db.add(holiday)
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="This date is already a holiday in that region.")
+    response = HolidayResponse.from_orm(holiday)
+    await db.commit()
+
+    # Refresh the in-memory calendar
+    await load_holidays()
+    return response
+
+
+# Delete a holiday
+@router.delete("/holidays/{holiday_id}")
+async def delete_holiday(
+    holiday_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_admin: Principal = Depends(get_current_admin),
+):
+    """Removes a holiday from the calendar."""
+    holiday = await db.get(Holiday, holiday_id)
+    if not holiday:
+        raise HTTPException(status_code=404, detail="Holiday not found")
+
+    await db.delete(holiday)
+    await db.commit()
+
+    # Refresh the in-memory calendar
+    await load_holidays()
+    return {"message": "Holiday successfully deleted"}
@@ -1,10 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.offer import Offer
 from app.schemas.offer import OfferCreate, OfferResponse,OfferUpdate
 from app.core.db import get_db
-from app.core.auth import get_current_owner
-from app.models.owner import Owner
+from app.core.auth import get_current_owner, Principal
+from app.utils.helpers import invalidate_offer
 from datetime import datetime, timezone
 
 router = APIRouter()
@@ -13,8 +13,8 @@ router = APIRouter()
 @router.post("/offers", response_model=OfferResponse)
 async def create_offer(
     offer: OfferCreate,
-    db: Session = Depends(get_db),
-    current_owner: Owner = Depends(get_current_owner),  # Assuming it returns an Owner object
+    db: AsyncSession = Depends(get_db),
+    current_owner: Principal = Depends(get_current_owner),
 ):
     # Ensure expiry date is valid
     """Creates a new offer, ensures expiry date is valid, and associates it with the owner."""
@@ -26,11 +26,11 @@ async def create_offer(
     try:
         new_offer = Offer(**offer.dict(), owner_id=current_owner.id)
         db.add(new_offer)
-        db.commit()
-        db.refresh(new_offer)
+        await db.commit()
+        invalidate_offer(new_offer.code)
         return new_offer
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"An error occurred while creating the offer: {str(e)}")
 
 
@@ -38,12 +38,12 @@ async def create_offer(
 async def update_offer(
     offer_id: int, 
     offer_data: OfferUpdate,
-    db: Session = Depends(get_db),
-    current_owner: Owner = Depends(get_current_owner),
+    db: AsyncSession = Depends(get_db),
+    current_owner: Principal = Depends(get_current_owner),
 ):
     # Fetch the offer
     """Updates an existing offer if it belongs to the authenticated owner."""
-    offer = db.query(Offer).filter(Offer.id == offer_id).first()
+    offer = await db.get(Offer, offer_id)
 
     if not offer:
         raise HTTPException(status_code=404, detail="Offer not found")
@@ -53,11 +53,14 @@ async def update_offer(
         raise HTTPException(status_code=403, detail="Not authorized to update this offer")
 
     # Update fields dynamically
+    old_code = offer.code
     for key, value in offer_data.dict(exclude_unset=True).items():
         setattr(offer, key, value)
 
-    db.commit()
-    db.refresh(offer)
+    await db.commit()
+    # Drop cached copies under both the old and the new code
+    invalidate_offer(old_code)
+    invalidate_offer(offer.code)
     return offer
 
 
@@ -67,12 +70,12 @@ async def update_offer(
 @router.delete("/offers/{offer_id}", status_code=200)
 async def delete_offer(
     offer_id: int,
-    db: Session = Depends(get_db),
-    current_owner: Owner = Depends(get_current_owner),
+    db: AsyncSession = Depends(get_db),
+    current_owner: Principal = Depends(get_current_owner),
 ):
     # Fetch the offer
     """Deletes an offer if it belongs to the authenticated owner."""
-    offer = db.query(Offer).filter(Offer.id == offer_id).first()
+    offer = await db.get(Offer, offer_id)
 
     if not offer:
         raise HTTPException(status_code=404, detail="Offer not found")
@@ -82,11 +85,12 @@ async def delete_offer(
         raise HTTPException(status_code=403, detail="Not authorized to delete this offer")
 
     # Delete the offer
-    if db.delete(offer):
-        raise HTTPException(status_code=200,detail="Offer delete Delete Successfully{offer_id}")
+    code = offer.code
+    await db.delete(offer)
+    await db.commit()
+    invalidate_offer(code)
 
-    db.refresh(offer)
-    db.commit()
+    return {"message": "Offer successfully deleted"}
 
     
 
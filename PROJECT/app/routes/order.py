@@ -1,104 +1,264 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from app.models.order import Order
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Header
+from sqlalchemy import select, delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.models.order import Order, OrderItem
 from app.models.product import Product
-from app.models.offer import Offer
-from app.schemas.order import OrderCreate, OrderResponse, OrderUpdate
-from app.schemas.product import ProductCreate, ProductResponse
-from app.utils.helpers import is_offer_valid, calculate_discount, is_public_holiday_or_sunday
-from app.core.db import get_db
-from app.core.auth import get_current_user
-from app.models.user import User
+from app.models.offer import Offer, OfferRedemption
+from app.schemas.order import OrderCreate, OrderResponse, OrderUpdate, CartCheckout, OrderDetailResponse, OrderPage
+from app.schemas.product import ProductCreate, ProductResponse, ProductPage
+from app.utils.helpers import is_offer_valid, is_public_holiday_or_sunday, record_redemption
+from app.utils.catalogue import fetch_product_page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.utils.order_history import fetch_order_page, DEFAULT_HISTORY_PAGE_SIZE, MAX_HISTORY_PAGE_SIZE
+from app.utils.stock import reserve_stock, release_stock
+from app.utils.response_cache import cached_response, invalidate_catalogue
+from app.utils.idempotency import request_fingerprint, replay_idempotent, store_idempotent
+from app.utils.pricing import price_order, check_amount_limits, to_money, AMOUNT_LIMIT_DETAIL
+from app.utils.sales import order_sales, record_sales
+from app.core.db import get_db, get_read_db, reads_from_replica
+from app.core.auth import get_current_user, Principal
 from datetime import datetime
-from typing import List
+from typing import Optional
 
 router = APIRouter()
 
 
 
-@router.get("/get_product", response_model=List[ProductResponse])  # List of products
+@router.get("/get_product", response_model=ProductPage, response_model_exclude_none=True)  # Page of products
 async def get_all_product(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = Query("id", regex="^(id|name)$"),
+    fields: Optional[str] = None,
+    owner_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user)
 ):
-    """Returns a list of all products. Accessible only to authenticated users."""
+    """Returns a page of products, optionally for a single owner. Accessible only to authenticated users."""
 
     if not current_user:
         raise HTTPException(status_code=404, detail="Not authorized, this is only for Owner")
 
-    # Fetch all products from the database
-    products = db.query(Product).all()
+    # Fetch one page, pass `next_cursor` back as `cursor` for the following page
+    async def build():
+        return await fetch_product_page(
+            db, limit=limit, cursor=cursor, sort=sort, fields=fields, owner_id=owner_id
+        )
+
+    # Served from the response cache until a product or its stock changes
+    return await cached_response(request, build, replica=reads_from_replica(db))
+
+
+# Get a single product
+@router.get("/product/{product_id}", response_model=ProductResponse)
+async def get_product(
+    product_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Returns one product. Accessible only to authenticated users."""
+
+    # Just the four columns of the response, no Product object
+    async def build():
+        row = (
+            await db.execute(
+                select(Product.name, Product.price, Product.stock, Product.id).where(Product.id == product_id)
+            )
+        ).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return dict(row._mapping)
+
+    return await cached_response(request, build, replica=reads_from_replica(db))
+
+
+async def lock_order(db: AsyncSession, order_id: int) -> Optional[Order]:
+    """
+    Load an order with its lines for a change, holding its row lock until the transaction
+    ends: concurrent changes to the same order (e.g. a retried DELETE) run one after the
+    other, and the later ones see the earlier one's result instead of the same stale state.
+    """
+    if db.bind.dialect.name == "sqlite":
+        # SQLite ignores FOR UPDATE; a no-op write takes its database write lock instead
+        await db.execute(update(Order.__table__).where(Order.__table__.c.id == order_id).values(id=Order.__table__.c.id))
+    return await db.get(
+        Order, order_id, options=[selectinload(Order.items)], with_for_update=True, populate_existing=True
+    )
+
+
+def ensure_order_lines(order: Order) -> None:
+    """Orders placed before order_items existed get a single line describing them."""
+    if not order.items:
+        order.items.append(
+            OrderItem(
+                product_id=order.product_id,
+                quantity=order.quantity,
+                unit_price=to_money(order.total_amount / order.quantity),
+                line_total=order.total_amount,
+            )
+        )
 
-    # Convert the products to the ProductResponse model
-    return products  # 
+
+def apply_order_totals(order: Order, offer: Optional[Offer] = None, detail: str = AMOUNT_LIMIT_DETAIL) -> None:
+    """
+    Price the order's lines and copy the totals onto the order, enforcing the amount limits.
+    Without an `offer` the discount the order already has is kept (capped at the new total).
+    """
+    totals = price_order(order.items, offer=offer, discount=order.discount_amount)
+    check_amount_limits(totals, detail)
+    order.quantity, order.total_amount, order.discount_amount, order.final_amount = totals
 
 
 @router.post("/order", response_model=OrderResponse)
 async def create_order(
     order_data: OrderCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     user_id = current_user.id
 
     """Creates a new order, checks for public holidays, product availability, and applies any valid offer code."""
+    # A retried request (same Idempotency-Key) gets the stored response, nothing is re-run
+    if idempotency_key:
+        fingerprint = await request_fingerprint(request)
+        replay = await replay_idempotent(db, user_id, idempotency_key, fingerprint)
+        if replay:
+            return replay
+
     # Check if today is a public holiday or Sunday
     if is_public_holiday_or_sunday():
         raise HTTPException(
             status_code=400, detail="Orders cannot be placed on public holidays or Sundays."
         )
 
-    # Fetch the product and validate stock
-    # Validate product availability and order details
-    product = db.query(Product).filter(Product.id == order_data.product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found.")
-    if product.stock < order_data.quantity:
-        raise HTTPException(
-            status_code=400, detail="Entered quantity is not available in stock."
-        )
-
-    # Calculate the total amount
-    total_amount = product.price * order_data.quantity
-
     # Handle offer code if provided
-    # Calculate total and apply offer (if any)
-    discount_amount = 0.0
+    # Validate the offer before touching stock so the product row is locked as briefly as possible
+    offer = None
     if order_data.offer_code:
-        offer = is_offer_valid(order_data.offer_code, db, user_id)
+        offer = await is_offer_valid(order_data.offer_code, db, user_id, order_data.product_id)
         if not offer:
             raise HTTPException(status_code=400, detail="Invalid or expired offer code.")
-        if offer.product_id and offer.product_id != order_data.product_id:
-            raise HTTPException(
-                status_code=400, detail="Offer code is not applicable for this product."
-            )
-        discount_amount = calculate_discount(total_amount, offer)
 
-    # Calculate final amount
-    # Create and save the order
-    final_amount = total_amount - discount_amount
-    if final_amount < 99 or final_amount > 4999:
-        raise HTTPException(
-            status_code=400, detail="Order amount must be between ₹99 and ₹4,999 after discount."
-        )
+    # Reserve the stock; any error below rolls the reservation back with the transaction
+    product = await reserve_stock(db, order_data.product_id, order_data.quantity)
 
     # Create the order
-    # Get an order by ID
     order = Order(
         user_id=user_id,
         product_id=order_data.product_id,
-        quantity=order_data.quantity,
         offer_code=order_data.offer_code,
-        total_amount=total_amount,
-        discount_amount=discount_amount,
-        final_amount=final_amount,
         created_at=datetime.utcnow(),
     )
+    order.items.append(
+        OrderItem(product_id=order_data.product_id, quantity=order_data.quantity, unit_price=product.price)
+    )
+
+    # Calculate the total, apply the offer (if any) and check the amount limits
+    apply_order_totals(order, offer)
     db.add(order)
-    db.commit()
-    db.refresh(order)
+    if offer:
+        # Record the redemption in the same transaction
+        await db.flush()
+        await record_redemption(db, offer, user_id, order.id)
+    else:
+        await db.flush()
+    # Owner sales summary, in the same transaction
+    await record_sales(db, {}, order_sales(order))
+
+    response = OrderResponse(
+        order_id=order.id,
+        user_id=order.user_id,
+        product_id=order.product_id,
+        total_amount=order.total_amount,
+        discount_amount=order.discount_amount,
+        final_amount=order.final_amount,
+        created_at=order.created_at.isoformat(),
+    )
+    if idempotency_key:
+        # Stored in the same transaction as the order
+        replay = await store_idempotent(db, user_id, idempotency_key, fingerprint, response)
+        if replay:
+            return replay
+    await db.commit()
+    await invalidate_catalogue()  # stock changed
+
+    return response
+
+
+# Check out a whole basket as one order
+@router.post("/checkout", response_model=OrderDetailResponse)
+async def checkout_cart(
+    cart: CartCheckout,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Creates one order for every line of a basket: prices, stock and the offer are handled in one transaction."""
+    user_id = current_user.id
 
-    return OrderResponse(
+    # Check if today is a public holiday or Sunday
+    if is_public_holiday_or_sunday():
+        raise HTTPException(
+            status_code=400, detail="Orders cannot be placed on public holidays or Sundays."
+        )
+
+    # Merge repeated products into one line each, keeping basket order
+    quantities = {}
+    for item in cart.items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+
+    # Load every product of the basket at once and fail fast before locking anything
+    rows = (
+        await db.execute(select(Product.id, Product.stock).where(Product.id.in_(list(quantities))))
+    ).all()
+    stock = {row.id: row.stock for row in rows}
+    missing = [product_id for product_id in quantities if product_id not in stock]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Product not found: {missing[0]}.")
+    short = [product_id for product_id, quantity in quantities.items() if stock[product_id] < quantity]
+    if short:
+        raise HTTPException(
+            status_code=400, detail=f"Entered quantity is not available in stock for product {short[0]}."
+        )
+
+    # Validate the offer; a product-specific offer needs its product in the basket
+    offer = None
+    if cart.offer_code:
+        offer = await is_offer_valid(cart.offer_code, db, user_id)
+        if offer.product_id and offer.product_id not in quantities:
+            raise HTTPException(
+                status_code=400, detail="Offer code is not applicable for this product."
+            )
+
+    # Reserve stock in product id order so concurrent baskets always lock rows in the same order
+    prices = {}
+    for product_id in sorted(quantities):
+        prices[product_id] = (await reserve_stock(db, product_id, quantities[product_id])).price
+
+    order = Order(
+        user_id=user_id,
+        product_id=next(iter(quantities)),
+        offer_code=cart.offer_code,
+        created_at=datetime.utcnow(),
+    )
+    for product_id, quantity in quantities.items():
+        order.items.append(OrderItem(product_id=product_id, quantity=quantity, unit_price=prices[product_id]))
+    # One pricing pass over the basket; product-specific offers discount their own line,
+    # others the whole basket
+    apply_order_totals(order, offer)
+
+    db.add(order)
+    if offer:
+        await db.flush()
+        await record_redemption(db, offer, user_id, order.id)
+    await record_sales(db, {}, order_sales(order))
+    await db.commit()
+    await invalidate_catalogue()  # stock changed
+
+    return OrderDetailResponse(
         order_id=order.id,
         user_id=order.user_id,
         product_id=order.product_id,
@@ -106,6 +266,23 @@ async def create_order(
         discount_amount=order.discount_amount,
         final_amount=order.final_amount,
         created_at=order.created_at.isoformat(),
+        items=order.items,
+    )
+
+
+# Order history of the current user
+@router.get("/orders", response_model=OrderPage)
+async def list_orders(
+    limit: int = Query(DEFAULT_HISTORY_PAGE_SIZE, ge=1, le=MAX_HISTORY_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Returns a page of the current user's orders, newest first. Pass `next_cursor` back as `cursor` for the next page."""
+    return await fetch_order_page(
+        db, current_user.id, limit=limit, cursor=cursor, created_from=created_from, created_to=created_to
     )
 
 
@@ -113,12 +290,16 @@ async def create_order(
 @router.get("/order/{order_id}", response_model=OrderResponse)
 async def get_order(
     order_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_db),
+    primary: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     # Fetch the order from the database
     """Fetches a specific order by its ID. Accessible only to the user who created the order."""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await db.get(Order, order_id)
+    if not order and db.bind is not primary.bind:
+        # Just created and not on the replica yet; read your own write from the primary
+        order = await primary.get(Order, order_id)
 
     # Check if the order exists
     if not order:
@@ -148,12 +329,12 @@ async def get_order(
 async def update_order(
     order_id: int,
     order_data: OrderUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     # Fetch the order
     """Updates an existing order if the user is authorized."""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await lock_order(db, order_id)
 
     # Check if the order exists
     if not order:
@@ -165,34 +346,43 @@ async def update_order(
             status_code=403, detail="Not authorized to update this order."
         )
 
+    # The update applies to the line of the order's (first) product
+    ensure_order_lines(order)
+    sales_before = order_sales(order)
+    line = next(item for item in order.items if item.product_id == order.product_id)
+
     # Update product if it has changed
     # Update order details (product and quantity)
+    new_quantity = order_data.quantity if order_data.quantity is not None else line.quantity
     if order_data.product_id is not None and order_data.product_id != order.product_id:
-        product = db.query(Product).filter(Product.id == order_data.product_id).first()
-        if not product:
-            raise HTTPException(status_code=404, detail="Product not found.")
-        if product.stock < (order_data.quantity or order.quantity):  # Check stock
-            raise HTTPException(
-                status_code=400,
-                detail="Entered quantity is not available in stock."
-            )
+        # Return the old product's units and reserve the new product's, locking the two
+        # product rows in id order like delete and checkout, so swapping updates cannot deadlock
+        if line.product_id < order_data.product_id:
+            await release_stock(db, line.product_id, line.quantity)
+            product = await reserve_stock(db, order_data.product_id, new_quantity)
+        else:
+            product = await reserve_stock(db, order_data.product_id, new_quantity)
+            await release_stock(db, line.product_id, line.quantity)
+        line.product_id = order_data.product_id
+        line.unit_price = product.price
         order.product_id = order_data.product_id
 
     # Update quantity if provided
-    if order_data.quantity is not None:
-        if order.product_id:
-            product = db.query(Product).filter(Product.id == order.product_id).first()
-            if product.stock < order_data.quantity:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Entered quantity is not available in stock."
-                )
-        order.quantity = order_data.quantity
+    elif new_quantity != line.quantity:
+        # Only the difference moves in or out of stock
+        difference = new_quantity - line.quantity
+        if difference > 0:
+            await reserve_stock(db, line.product_id, difference)
+        else:
+            await release_stock(db, line.product_id, -difference)
+    line.quantity = new_quantity
+    apply_order_totals(order)
+    await record_sales(db, sales_before, order_sales(order))
 
     # Commit the changes
     # Commit and return updated order
-    db.commit()
-    db.refresh(order)
+    await db.commit()
+    await invalidate_catalogue()  # stock changed
 
     # Return updated order
     return OrderResponse(
@@ -209,12 +399,12 @@ async def update_order(
 @router.delete("/order/{order_id}", status_code=204)
 async def delete_order(
     order_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     # Fetch the order
     """Deletes an order if it belongs to the authenticated user."""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await lock_order(db, order_id)
 
     # Check if the order exists
     if not order:
@@ -226,9 +416,17 @@ async def delete_order(
             status_code=403, detail="Not authorized to delete this order."
         )
 
-    # Delete the order
-    db.delete(order)
-    db.commit()
+    # Delete the order and put every line's units back in stock
+    ensure_order_lines(order)
+    for item in sorted(order.items, key=lambda item: item.product_id):
+        await release_stock(db, item.product_id, item.quantity)
+    await record_sales(db, order_sales(order), {})
+    if order.offer_code:
+        # Deleting the order gives the offer back to the user
+        await db.execute(delete(OfferRedemption).where(OfferRedemption.order_id == order.id))
+    await db.delete(order)
+    await db.commit()
+    await invalidate_catalogue()  # stock changed
 
     return {"message": "Order successfully deleted"}
     
@@ -239,13 +437,22 @@ async def delete_order(
 async def add_product_to_order(
     order_id: int,
     product_id: int,
-    quantity: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    quantity: int = Query(..., gt=0),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
 ):
     # Fetch the order by ID
     """Adds a product to an existing order if stock is available and final amount is within limits."""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    # A retried request (same Idempotency-Key) gets the stored response, nothing is re-run
+    if idempotency_key:
+        fingerprint = await request_fingerprint(request)
+        replay = await replay_idempotent(db, current_user.id, idempotency_key, fingerprint)
+        if replay:
+            return replay
+
+    order = await lock_order(db, order_id)
 
     # Check if the order exists
     if not order:
@@ -255,43 +462,30 @@ async def add_product_to_order(
     if order.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to modify this order")
 
-    # Fetch the product by ID
-    product = db.query(Product).filter(Product.id == product_id).first()
+    # Reserve the units; rolled back with the transaction if the amount check fails
+    product = await reserve_stock(db, product_id, quantity)
 
-    # Check if the product exists
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-
-    # Check product stock availability
-    if product.stock < quantity:
-        raise HTTPException(
-            status_code=400, detail="Entered quantity is not available in stock"
-        )
-
-    # Update the total amount and quantities
-    additional_amount = product.price * quantity
-    new_total_amount = order.total_amount + additional_amount
+    # Add the product as its own line, or top up its existing line at the same price
+    ensure_order_lines(order)
+    sales_before = order_sales(order)
+    line = next(
+        (item for item in order.items if item.product_id == product_id and item.unit_price == product.price),
+        None,
+    )
+    if line is None:
+        line = OrderItem(product_id=product_id, quantity=0, unit_price=product.price)
+        order.items.append(line)
+    line.quantity += quantity
 
+    # Update the total amount and quantities; the existing discount is kept as is
     # Ensure the updated final amount is within limits
-    if new_total_amount < 99 or new_total_amount > 4999:
-        raise HTTPException(
-            status_code=400,
-            detail="Order amount must be between ₹99 and ₹4,999 after adding the product",
-        )
-
-    # Update the order
-    order.quantity += quantity  # Update quantity
-    order.total_amount = new_total_amount
-    order.final_amount = new_total_amount  # Assuming no discounts apply to the new product
+    apply_order_totals(order, detail="Order amount must be between ₹99 and ₹4,999 after adding the product")
     order.created_at = datetime.utcnow()
+    # Moves the whole order's sales to today, like created_at
+    await record_sales(db, sales_before, order_sales(order))
 
-
-    # Commit changes to the database
-    db.commit()
-    db.refresh(order)
-
-    # Return the updated order
-    return OrderResponse(
+    # The updated order
+    response = OrderResponse(
         order_id=order.id,
         user_id=order.user_id,
         product_id=product_id,
@@ -300,6 +494,17 @@ async def add_product_to_order(
         final_amount=order.final_amount,
         created_at=order.created_at.isoformat(),
     )
+    if idempotency_key:
+        # Stored in the same transaction as the change
+        replay = await store_idempotent(db, current_user.id, idempotency_key, fingerprint, response)
+        if replay:
+            return replay
+
+    # Commit changes to the database
+    await db.commit()
+    await invalidate_catalogue()  # stock changed
+
+    return response
 
 
 
@@ -1,45 +1,157 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.owner import OwnerCreate, OwnerResponse
 from app.models.owner import Owner
 from app.schemas.offer import OfferCreate, OfferResponse
 from app.models.offer import Offer
+from app.models.product import Product
+from app.models.sales import ProductSalesDaily
+from app.schemas.sales import SalesReport, DailySalesReport
 from datetime import datetime, timezone
-from app.core.db import get_db
-from app.core.auth import create_access_token, authenticate_owner,hash_password
-from datetime import datetime
+from app.core.db import get_db, get_read_db
+from app.core.auth import create_access_token, authenticate_owner,hash_password_async, get_current_owner, Principal
+from datetime import datetime, date, timedelta
+from typing import Optional
 
 router = APIRouter()
 
 # Register a new owner
 @router.post("/register", response_model=OwnerResponse)
-def register_owner(owner: OwnerCreate, db: Session = Depends(get_db)):
+async def register_owner(owner: OwnerCreate, db: AsyncSession = Depends(get_db)):
     """Registers a new owner by checking if the username is already taken and saving the owner to the database."""
 
-    existing_owner = db.query(Owner).filter(Owner.ownername == owner.ownername).first()
+    existing_owner = await db.scalar(select(Owner).where(Owner.ownername == owner.ownername))
     if existing_owner:
         raise HTTPException(status_code=400, detail="Ownername already taken")
     
     # Hash the password before saving it
-    new_owner = Owner(ownername=owner.ownername, password=hash_password(owner.password))  # Hash password
+    new_owner = Owner(ownername=owner.ownername, password=await hash_password_async(owner.password))  # Hash password
     db.add(new_owner)
-    db.commit()
-    db.refresh(new_owner)
+    await db.commit()
     return new_owner
 
 
 # Login an existing owner
 @router.post("/login")
-def login_owner(owner: OwnerCreate, db: Session = Depends(get_db)):
+async def login_owner(owner: OwnerCreate, db: AsyncSession = Depends(get_db)):
     """Authenticates an owner and returns a JWT token if the credentials are valid."""
 
     # Authenticate the owner based on username and password
-    authenticated_owner = authenticate_owner(db, owner.ownername, owner.password)
+    authenticated_owner = await authenticate_owner(db, owner.ownername, owner.password)
     if not authenticated_owner:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
 
     # Generate and return a JWT token
-    token = create_access_token(data={"sub": authenticated_owner.ownername})
+    # id and role travel in the token so authenticated requests skip the owner lookup
+    token = create_access_token(
+        data={"sub": authenticated_owner.ownername, "uid": authenticated_owner.id, "role": "owner"}
+    )
     
     return {"access_token": token, "token_type": "bearer"}
+
+
+# Sales analytics, read from the product_sales_daily summary (never from orders)
+MAX_REPORT_DAYS = 366
+DEFAULT_REPORT_DAYS = 30
+
+
+def report_range(date_from: Optional[date], date_to: Optional[date]):
+    """Both ends inclusive; defaults to the last 30 days (UTC)."""
+    date_to = date_to or datetime.utcnow().date()
+    date_from = date_from or date_to - timedelta(days=DEFAULT_REPORT_DAYS - 1)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to.")
+    if (date_to - date_from).days >= MAX_REPORT_DAYS:
+        raise HTTPException(status_code=400, detail=f"A report covers at most {MAX_REPORT_DAYS} days.")
+    return date_from, date_to
+
+
+def owner_sales(owner_id: int, date_from: date, date_to: date, product_id: Optional[int]):
+    query = (
+        select(ProductSalesDaily, Product.name)
+        .join(Product, Product.id == ProductSalesDaily.product_id)
+        .where(Product.owner_id == owner_id, ProductSalesDaily.day.between(date_from, date_to))
+        .where(ProductSalesDaily.orders > 0)  # left at zero when every order of the day was deleted
+    )
+    if product_id is not None:
+        query = query.where(Product.id == product_id)
+    return query
+
+
+# Totals per product over a date range
+@router.get("/sales", response_model=SalesReport)
+async def get_sales(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    product_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_owner: Principal = Depends(get_current_owner),
+):
+    """Revenue, units and discount given per product of the current owner, best sellers first."""
+    date_from, date_to = report_range(date_from, date_to)
+    summary = owner_sales(current_owner.id, date_from, date_to, product_id).subquery()
+    rows = (
+        await db.execute(
+            select(
+                summary.c.product_id,
+                summary.c.name,
+                func.sum(summary.c.orders).label("orders"),
+                func.sum(summary.c.units).label("units"),
+                func.sum(summary.c.revenue).label("revenue"),
+                func.sum(summary.c.discount).label("discount"),
+            )
+            .group_by(summary.c.product_id, summary.c.name)
+            .order_by(func.sum(summary.c.revenue).desc(), summary.c.product_id)
+        )
+    ).all()
+    products = [
+        {
+            "product_id": row.product_id,
+            "product_name": row.name,
+            "orders": row.orders,
+            "units": row.units,
+            "revenue": row.revenue,
+            "discount": row.discount,
+        }
+        for row in rows
+    ]
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "orders": sum(row.orders for row in rows),
+        "units": sum(row.units for row in rows),
+        "revenue": sum(row.revenue for row in rows),
+        "discount": sum(row.discount for row in rows),
+        "products": products,
+    }
+
+
+# Per product per day
+@router.get("/sales/daily", response_model=DailySalesReport)
+async def get_daily_sales(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    product_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_owner: Principal = Depends(get_current_owner),
+):
+    """Revenue, units and discount given per product and day, oldest day first."""
+    date_from, date_to = report_range(date_from, date_to)
+    query = owner_sales(current_owner.id, date_from, date_to, product_id).order_by(
+        ProductSalesDaily.day, ProductSalesDaily.product_id
+    )
+    days = [
+        {
+            "product_id": sales.product_id,
+            "product_name": name,
+            "day": sales.day,
+            "orders": sales.orders,
+            "units": sales.units,
+            "revenue": sales.revenue,
+            "discount": sales.discount,
+        }
+        for sales, name in (await db.execute(query)).all()
+    ]
+    return {"date_from": date_from, "date_to": date_to, "days": days}
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from app.models.product import Product
-from app.models.owner import Owner
-from app.schemas.product import ProductCreate, ProductResponse
-from app.core.auth import get_current_owner
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.product import Product, ProductImport
+from app.schemas.product import ProductCreate, ProductResponse, ProductPage, ProductImportResponse
+from app.core.auth import get_current_owner, Principal
 from app.core.db import get_db
-from typing import List
+from typing import Optional
+from app.utils.catalogue import fetch_product_page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.utils.pricing import to_money
+from app.utils.product_import import run_product_import, IMPORT_FORMATS
+from app.utils.response_cache import cached_response, invalidate_catalogue
 
 router = APIRouter()
 
@@ -13,63 +17,112 @@ router = APIRouter()
 @router.post("/product", response_model=ProductResponse)
 async def add_product(
     product_data: ProductCreate, 
-    db: Session = Depends(get_db),
-    current_owner: Owner = Depends(get_current_owner)):
+    db: AsyncSession = Depends(get_db),
+    current_owner: Principal = Depends(get_current_owner)):
 
     """Adds a new product to the database."""
-    
-    # Check if the product already exists
-    existing_product = db.query(Product).filter(Product.name == product_data.name).first()
-    if existing_product:
-        raise HTTPException(status_code=400, detail="Product already exists.")
-    
 
-    # Create and add the product to the database
     # Create and add the product to the database
     product = Product(
         name=product_data.name,
-        price=product_data.price,
+        price=to_money(product_data.price),
         stock=product_data.stock,
         owner_id=current_owner.id
     )
     db.add(product)
-    db.commit()
-    db.refresh(product)
-
-    return ProductResponse(
-        id=product.id,
-        name=product.name,
-        price=product.price,
-        stock=product.stock
+    # The unique (owner_id, name) constraint rejects duplicates, even between concurrent requests
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Product already exists.")
+    await db.commit()
+    await invalidate_catalogue()
+
+    return ProductResponse.from_orm(product)
+
+
+# Bulk Import Products API
+@router.post("/import", response_model=ProductImportResponse)
+async def import_products(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_owner: Principal = Depends(get_current_owner)
+):
+    """
+    Creates or updates the owner's products from a CSV (`name,price,stock` header) or NDJSON upload.
+    The body is read as a stream and written in batches; follow GET /product/import/{id} for progress.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    fmt = IMPORT_FORMATS.get(content_type)
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Upload products as text/csv or application/x-ndjson.")
+
+    # Record the import first so its progress is visible while the upload runs
+    job = ProductImport(
+        owner_id=current_owner.id, format=fmt, status="running", rows_read=0, rows_imported=0, rows_rejected=0
     )
+    db.add(job)
+    await db.commit()
+
+    try:
+        await run_product_import(db, job, fmt, request.stream())
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Upload is not valid UTF-8.")
+    finally:
+        # Batches are committed as they go, even when the upload fails later
+        await invalidate_catalogue()
+
+    return job
+
+
+# Import Status API
+@router.get("/import/{import_id}", response_model=ProductImportResponse)
+async def get_product_import(
+    import_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_owner: Principal = Depends(get_current_owner)
+):
+    """Progress and outcome of one of the owner's product imports."""
+    job = await db.get(ProductImport, import_id)
+    if not job or job.owner_id != current_owner.id:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return job
 
 
 # Get All Products API
-@router.get("/get_product", response_model=List[ProductResponse])  # List of products
+@router.get("/get_product", response_model=ProductPage, response_model_exclude_none=True)  # Page of products
 async def get_all_product(
-    db: Session = Depends(get_db),
-    current_owner: Owner = Depends(get_current_owner)
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = Query("id", regex="^(id|name)$"),
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_owner: Principal = Depends(get_current_owner)
 ):
-    """Fetches all products owned by the current owner."""
+    """Fetches a page of the products owned by the current owner."""
     if not current_owner:
         raise HTTPException(status_code=404, detail="Not authorized, this is only for Owner")
 
-    # Fetch all products from the database
-    products = db.query(Product).all()
+    # Only this owner's products, served from the (owner_id, id) index
+    async def build():
+        return await fetch_product_page(
+            db, limit=limit, cursor=cursor, sort=sort, fields=fields, owner_id=current_owner.id
+        )
 
-    # Convert the products to the ProductResponse model
-    return products  # 
+    return await cached_response(request, build, scope=f"owner:{current_owner.id}")
 
 
 # Delete Product API
 @router.delete("/product/{product_id}",status_code=200)
 async def delete_product(
     Product_int : int,
-    db : Session = Depends(get_db),
-    current_owner: Owner = Depends(get_current_owner)
+    db : AsyncSession = Depends(get_db),
+    current_owner: Principal = Depends(get_current_owner)
 ):
     """Deletes a product owned by the current owner."""  
-    product = db.query(Product).filter(Product.id == Product_int).first()
+    product = await db.get(Product, Product_int)
     
     #find order
     if not product:
@@ -81,8 +134,9 @@ async def delete_product(
         raise HTTPException(status_code=403, detail="Not authorized to delete this product")
 
     # Delete the order
-    db.delete(product)
-    db.commit()
+    await db.delete(product)
+    await db.commit()
+    await invalidate_catalogue()
 
     return {"message": "Product successfully deleted"}
     
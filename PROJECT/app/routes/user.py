@@ -1,38 +1,41 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.user import UserCreate, UserResponse
 from app.models.user import User
-from app.core.auth import create_access_token, authenticate_user,hash_password
+from app.core.auth import create_access_token, authenticate_user,hash_password_async
 from app.core.db import get_db
 
 router = APIRouter()
 
 @router.post("/register", response_model=UserResponse)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new user with a hashed password."""
     
     # Check if username already exists
-    existing_user = db.query(User).filter(User.username == user.username).first()
+    existing_user = await db.scalar(select(User).where(User.username == user.username))
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already taken")
      
     # Hash the password and create a new user
-    new_user = User(username=user.username, password=hash_password(user.password))  # Hash password
+    new_user = User(username=user.username, password=await hash_password_async(user.password))  # Hash password
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     return new_user
 
 @router.post("/login")
-def login_user(user: UserCreate, db: Session = Depends(get_db)):
+async def login_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     """Login user and return a JWT token."""
     
     # Authenticate the user with username and password
     # Pass arguments in the correct order (username, password, db)
-    authenticated_user = authenticate_user(user.username, user.password, db)
+    authenticated_user = await authenticate_user(user.username, user.password, db)
     if not authenticated_user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Create an access token
-    token = create_access_token(data={"sub": authenticated_user.username})  # Create token
+    # id and role travel in the token so authenticated requests skip the user lookup
+    token = create_access_token(
+        data={"sub": authenticated_user.username, "uid": authenticated_user.id, "role": "user"}
+    )  # Create token
     return {"access_token": token, "token_type": "bearer"}
@@ -0,0 +1,18 @@
+from pydantic import BaseModel, Field
+from datetime import date
+from typing import Optional
+
+class HolidayBase(BaseModel):
+    date: date
+    name: str = Field(..., min_length=1, max_length=100)
+    region: Optional[str] = Field(None, max_length=32)  # defaults to HOLIDAY_REGION
+
+class HolidayCreate(HolidayBase):
+    pass
+
+class HolidayResponse(HolidayBase):
+    id: int
+    region: str
+
+    class Config:
+        orm_mode = True
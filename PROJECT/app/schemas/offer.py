@@ -1,10 +1,11 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
+from decimal import Decimal
 from typing import Optional
 
 class OfferBase(BaseModel):
     code: str = Field(..., min_length=3, max_length=20)
-    discount_value: float
+    discount_value: Decimal
     is_percentage: bool
     expiry_date: datetime  # Use timezone-aware datetime
     product_id: int
@@ -15,7 +16,7 @@ class OfferCreate(OfferBase):
 
 class OfferUpdate(OfferBase):
     code:str =Field(..., min_length=3, max_length=20)
-    discount_value :float
+    discount_value :Decimal
     is_percentage : bool
     expiry_date : datetime
     product_id : int
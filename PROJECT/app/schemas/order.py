@@ -1,9 +1,9 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 
 class OrderCreate(BaseModel):
     product_id: int
-    quantity: int
+    quantity: int = Field(..., gt=0)
     offer_code: Optional[str] = None  # Offers are optional
 
     class Config:
@@ -11,7 +11,7 @@ class OrderCreate(BaseModel):
 
 class OrderUpdate(BaseModel):
     product_id : int
-    quantity : int
+    quantity : int = Field(..., gt=0)
 
     class Config:
         orm_mode = True
@@ -28,3 +28,36 @@ class OrderResponse(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class OrderSummary(BaseModel):
+    # One row of the order history; GET /order/order/{order_id} has the full order
+    order_id: int
+    product_id: int
+    final_amount: float
+    created_at: str
+
+class OrderPage(BaseModel):
+    items: List[OrderSummary]
+    next_cursor: Optional[str] = None
+
+
+class CartItem(BaseModel):
+    product_id: int
+    quantity: int = Field(..., gt=0)
+
+class CartCheckout(BaseModel):
+    items: List[CartItem] = Field(..., min_items=1, max_items=100)
+    offer_code: Optional[str] = None
+
+class OrderItemResponse(BaseModel):
+    product_id: int
+    quantity: int
+    unit_price: float
+    line_total: float
+
+    class Config:
+        orm_mode = True
+
+class OrderDetailResponse(OrderResponse):
+    items: List[OrderItemResponse] = []
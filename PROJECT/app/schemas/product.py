@@ -1,9 +1,12 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
+from decimal import Decimal
+from datetime import datetime
+import json
 from typing import List, Optional
 from app.schemas.offer import OfferResponse
 class ProductBase(BaseModel):
     name: str
-    price: float
+    price: Decimal
     stock: int
 
 class ProductCreate(ProductBase):
@@ -15,6 +18,42 @@ class ProductResponse(ProductBase):
     class Config:
         orm_mode = True
 
+class ProductSummary(BaseModel):
+    # Only the fields requested through `?fields=` are filled in
+    id: int
+    name: Optional[str] = None
+    price: Optional[float] = None
+    stock: Optional[int] = None
+
+class ProductPage(BaseModel):
+    items: List[ProductSummary]
+    next_cursor: Optional[str] = None
+
+class ProductImportError(BaseModel):
+    line: int
+    error: str
+
+class ProductImportResponse(BaseModel):
+    id: int
+    format: str
+    status: str
+    rows_read: int
+    rows_imported: int
+    rows_rejected: int
+    errors: List[ProductImportError] = []
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    # Stored as a JSON string on the import record
+    @validator("errors", pre=True)
+    def load_errors(cls, value):
+        if isinstance(value, str):
+            return json.loads(value)
+        return value or []
+
+    class Config:
+        orm_mode = True
+
 class ProductWithOffers(ProductResponse):
     offers: Optional[List["OfferResponse"]] = []
 
@@ -0,0 +1,28 @@
+from pydantic import BaseModel
+from datetime import date
+from typing import List
+
+class ProductSales(BaseModel):
+    product_id: int
+    product_name: str
+    orders: int
+    units: int
+    revenue: float  # paid, after discount
+    discount: float
+
+class ProductSalesDay(ProductSales):
+    day: date
+
+class SalesReport(BaseModel):
+    date_from: date
+    date_to: date
+    orders: int  # order lines summed over products; an order with two products counts twice
+    units: int
+    revenue: float
+    discount: float
+    products: List[ProductSales]
+
+class DailySalesReport(BaseModel):
+    date_from: date
+    date_to: date
+    days: List[ProductSalesDay]
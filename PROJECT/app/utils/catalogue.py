@@ -0,0 +1,74 @@
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.product import Product
+from app.utils.pagination import encode_cursor, decode_cursor
+
+# Product listings are served a page at a time
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+PRODUCT_FIELDS = ("id", "name", "price", "stock")
+SORT_KEYS = {
+    "id": (Product.id,),
+    "name": (Product.name, Product.id),
+}
+CURSOR_TYPES = {"id": int, "name": str}
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Turn `?fields=name,price` into the list of columns to return; `id` is always included."""
+    if not fields:
+        return list(PRODUCT_FIELDS)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = set(requested) - set(PRODUCT_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown product fields: {', '.join(sorted(unknown))}")
+    return ["id"] + [f for f in PRODUCT_FIELDS if f in requested and f != "id"]
+
+
+async def fetch_product_page(
+    db: AsyncSession,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    sort: str = "id",
+    fields: Optional[str] = None,
+    owner_id: Optional[int] = None,
+) -> dict:
+    """
+    Keyset-paginated product listing ordered by `sort` (id, or name then id).
+    Returns the page items as plain dicts, ready to serialise, and the cursor for the
+    next page (left out on the last page). Only the needed columns are selected and the
+    rows stay tuples; no Product objects are built.
+    """
+    columns = parse_fields(fields)
+    sort_columns = SORT_KEYS[sort]
+
+    # Requested columns first, then whatever the cursor needs on top
+    selected = columns + [c.key for c in sort_columns if c.key not in columns]
+    query = select(*(getattr(Product, c) for c in selected))
+    if owner_id is not None:
+        query = query.where(Product.owner_id == owner_id)
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(sort_columns) + 1 or values[0] != sort:
+            raise HTTPException(status_code=400, detail="Cursor does not match the requested sort order.")
+        # The values go straight into the comparison, so each must have its column's type
+        if not all(
+            isinstance(value, CURSOR_TYPES[column.key]) and not isinstance(value, bool)
+            for column, value in zip(sort_columns, values[1:])
+        ):
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+        query = query.where(tuple_(*sort_columns) > tuple_(*values[1:]))
+    # Fetch one extra row to know whether another page exists
+    query = query.order_by(*sort_columns).limit(limit + 1)
+
+    rows = (await db.execute(query)).all()
+    page = {"items": [dict(zip(columns, row)) for row in rows[:limit]]}
+    if len(rows) > limit:
+        last = rows[limit - 1]._mapping
+        page["next_cursor"] = encode_cursor([sort] + [last[c.key] for c in sort_columns])
+    return page
@@ -1,36 +1,110 @@
 from datetime import datetime, timezone
 import calendar
-from typing import Optional
-from app.models.offer import Offer
-from app.models.order import Order
-from sqlalchemy.orm import Session
+from typing import Dict, Optional
+from app.models.offer import Offer, OfferRedemption
+from sqlalchemy import select, exists
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
+from app.utils.cache import TTLCache
+from app.utils.holidays import is_holiday
+from app.utils.singleflight import SingleFlight
+import os
+
+# Offers change rarely, so lookups by code are cached in-process until the offer expires.
+# invalidate_offer only reaches the worker that made the change, so another worker keeps
+# honouring an edited or deleted offer for up to OFFER_CACHE_TTL; keep it short. Redeeming a
+# deleted offer fails on the foreign key (where enforced) and answers "Invalid offer code."
+OFFER_CACHE_TTL = float(os.getenv("OFFER_CACHE_TTL", "30"))
+offer_cache = TTLCache(maxsize=1024, ttl=OFFER_CACHE_TTL)
+# Bumped by invalidate_offer, so a lookup that was running during a change does not cache
+# the row it read before the change
+offer_versions: Dict[str, int] = {}
+# Concurrent lookups of an uncached code share one query
+offer_flight = SingleFlight("offers")
 
-# Ensure the expiry date is timezone-aware, and also handle cases with no expiry date (if allowed)
 # Helper function to check if today is a public holiday or Sunday
+# Holidays come from the holidays table (managed through /holiday/holidays), kept in memory
 def is_public_holiday_or_sunday() -> bool:
     today = datetime.utcnow().date()
-    # List of public holidays (for demonstration, add more holidays as required)
-    public_holidays = [
-        datetime(2024, 1, 1).date(),  # New Year
-        datetime(2024, 8, 15).date(),  # Independence Day (example)
-        datetime(2024, 1, 26).date()   # Republic Day (example)
-        # Add other public holidays here
-    ]
-    if today.weekday() == calendar.SUNDAY or today in public_holidays:
+    if today.weekday() == calendar.SUNDAY or is_holiday(today):
         return True
     return False
 
 
-def is_offer_valid(offer_code: str, db: Session, user_id: int) -> Offer:
-    # Fetch the offer from the database
-    offer = db.query(Offer).filter(Offer.code == offer_code).first()
-    if not offer:
-        raise HTTPException(status_code=400, detail="Invalid offer code.")  # Return error for invalid offer code
+def invalidate_offer(offer_code: str) -> None:
+    """Forget a cached offer; called whenever an offer is created, changed or deleted."""
+    offer_versions[offer_code] = offer_versions.get(offer_code, 0) + 1
+    offer_cache.pop(offer_code)
+
+
+def _already_redeemed(offer_id, user_id: int):
+    # Served by the unique (user_id, offer_id) index on offer_redemptions
+    return exists().where(OfferRedemption.user_id == user_id, OfferRedemption.offer_id == offer_id)
 
+
+def cache_offer(offer_code: str, offer: Offer, db: AsyncSession, version: int) -> Offer:
+    """Detach a freshly read offer and cache it, unless the offer changed since `version`."""
+    # Detach so the cached offer survives this request's session
+    db.expunge(offer)
     # Ensure the offer's expiry date is timezone-aware
     if offer.expiry_date.tzinfo is None:
         offer.expiry_date = offer.expiry_date.replace(tzinfo=timezone.utc)  # Make naive datetime aware
+    if offer_versions.get(offer_code, 0) == version:
+        # The entry is dropped the moment the offer expires
+        offer_cache.set(offer_code, offer, expires_at=offer.expiry_date.timestamp())
+    return offer
+
+
+async def record_redemption(db: AsyncSession, offer: Offer, user_id: int, order_id: int) -> None:
+    """
+    Add the redemption row for an order in the order's transaction. The unique
+    (user_id, offer_id) key rejects a concurrent second claim of the same offer. The offer is
+    not read again: a cached copy is trusted for up to OFFER_CACHE_TTL (see above).
+    """
+    db.add(OfferRedemption(user_id=user_id, offer_id=offer.id, order_id=order_id))
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        # Deleted by another worker while cached here: the foreign key failed (Postgres), not the
+        # unique key
+        if await db.scalar(select(Offer.id).where(Offer.id == offer.id)) is None:
+            invalidate_offer(offer.code)
+            raise HTTPException(status_code=400, detail="Invalid offer code.")
+        raise HTTPException(status_code=400, detail="Offer code has already been used or claimed by this user.")
+
+
+async def is_offer_valid(offer_code: str, db: AsyncSession, user_id: int, product_id: Optional[int] = None) -> Offer:
+    """
+    Check that an offer exists, has not expired, has not been redeemed by this user and
+    (when `product_id` is given) applies to that product - in a single query. The offer
+    row itself comes from the offer cache when possible.
+    """
+    redeemed = None
+    offer = offer_cache.get(offer_code)
+    if offer is None:
+        version = offer_versions.get(offer_code, 0)
+
+        async def lookup():
+            # Offer and "already redeemed" flag in one round trip
+            row = (
+                await db.execute(
+                    select(Offer, _already_redeemed(Offer.id, user_id).label("redeemed")).where(Offer.code == offer_code)
+                )
+            ).first()
+            if row is None:
+                return None
+            nonlocal redeemed
+            redeemed = row.redeemed
+            return cache_offer(offer_code, row.Offer, db, version)
+
+        # Requests arriving while the lookup runs share its offer row, then only check redemption
+        offer = await offer_flight.do(offer_code, lookup)
+        if offer is None:
+            raise HTTPException(status_code=400, detail="Invalid offer code.")  # Return error for invalid offer code
+    if redeemed is None:
+        redeemed = await db.scalar(select(_already_redeemed(offer.id, user_id)))
 
     # Check if the offer has expired
     current_time = datetime.now(timezone.utc)  # Use timezone-aware datetime
@@ -38,21 +112,12 @@ def is_offer_valid(offer_code: str, db: Session, user_id: int) -> Offer:
         raise HTTPException(status_code=400, detail="Offer code has expired.")  # Return error for expired offer
 
     # Check if the user has already used or claimed this offer code
-    offer_used = db.query(Order).filter(Order.user_id == user_id, Order.offer_code == offer_code).first()
-    if offer_used:
+    if redeemed:
         raise HTTPException(status_code=400, detail="Offer code has already been used or claimed by this user.")
 
-    return offer  # If all validations pass, return the offer object
+    # Product-specific offers only apply to their product
+    if product_id is not None and offer.product_id and offer.product_id != product_id:
+        raise HTTPException(status_code=400, detail="Offer code is not applicable for this product.")
 
+    return offer  # If all validations pass, return the offer object
 
-def calculate_discount(order_total: float, offer: Offer) -> float:
-    """
-    Calculate the discount based on whether the offer is a percentage or a fixed amount.
-    """
-    if offer.is_percentage:
-        discount = order_total * (offer.discount_value / 100)
-    else:
-        discount = offer.discount_value
-    
-    # Ensure the discount does not exceed the total amount of the order
-    return min(discount, order_total)
@@ -0,0 +1,49 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, FrozenSet
+
+from sqlalchemy import select
+
+from app.core.db import AsyncSessionLocal
+from app.models.holiday import Holiday
+
+# Region (store) whose calendar this deployment follows
+HOLIDAY_REGION = os.getenv("HOLIDAY_REGION", "IN")
+# Seconds between reloads, so every worker picks up holidays added through another one
+HOLIDAY_REFRESH_INTERVAL = int(os.getenv("HOLIDAY_REFRESH_INTERVAL", "300"))
+
+logger = logging.getLogger(__name__)
+
+# region -> upcoming holiday dates; replaced as a whole on reload, so lookups never see half a calendar
+_calendar: Dict[str, FrozenSet[date]] = {}
+
+
+async def load_holidays() -> None:
+    """Load today's and future holidays of every region from the database."""
+    global _calendar
+    since = datetime.utcnow().date() - timedelta(days=1)
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(select(Holiday.region, Holiday.date).where(Holiday.date >= since))).all()
+    calendar = defaultdict(set)
+    for region, day in rows:
+        calendar[region].add(day)
+    _calendar = {region: frozenset(days) for region, days in calendar.items()}
+
+
+def is_holiday(day: date, region: str = HOLIDAY_REGION) -> bool:
+    """O(1) check against the in-memory calendar."""
+    return day in _calendar.get(region, ())
+
+
+async def refresh_holidays_periodically() -> None:
+    """Background task started with the app: reload the calendar every HOLIDAY_REFRESH_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(HOLIDAY_REFRESH_INTERVAL)
+        try:
+            await load_holidays()
+        except Exception:
+            # Keep serving the last calendar loaded
+            logger.exception("Reloading the holiday calendar failed")
@@ -0,0 +1,99 @@
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.models.idempotency import IdempotencyKey
+
+# Responses of requests sent with an Idempotency-Key header are kept this long (seconds);
+# a retry with the same key inside the window gets the stored response back.
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+# Expired keys are deleted at most this often (seconds), piggybacking on a request that stores one
+IDEMPOTENCY_PURGE_INTERVAL = 600
+
+_last_purge = 0.0
+
+
+async def request_fingerprint(request: Request) -> str:
+    """Hash of what the request asks for: method, path, query (minus the token) and body."""
+    params = sorted((k, v) for k, v in request.query_params.multi_items() if k != "token")
+    digest = hashlib.sha256(f"{request.method} {request.url.path} {params}\n".encode())
+    digest.update(await request.body())
+    return digest.hexdigest()
+
+
+def _replay(stored: IdempotencyKey) -> Response:
+    return Response(
+        content=stored.response_body,
+        status_code=stored.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+async def replay_idempotent(db: AsyncSession, user_id: int, key: str, fingerprint: str) -> Optional[Response]:
+    """The stored response for this user's key, or None when the request has to run."""
+    stored = await db.scalar(
+        select(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.expires_at > datetime.utcnow(),
+        )
+    )
+    if stored is None:
+        return None
+    if stored.fingerprint != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request.")
+    return _replay(stored)
+
+
+async def store_idempotent(
+    db: AsyncSession, user_id: int, key: str, fingerprint: str, response: BaseModel, status_code: int = 200
+) -> Optional[Response]:
+    """
+    Save the response in the caller's transaction, before it commits, so the order and its
+    stored response are written together. If a concurrent retry with the same key won the
+    race, this transaction is rolled back and the winner's response is returned instead.
+    """
+    global _last_purge
+    now = datetime.utcnow()
+    if time.time() - _last_purge > IDEMPOTENCY_PURGE_INTERVAL:
+        _last_purge = time.time()
+        await db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= now))
+    else:
+        # An expired entry for this key would block the new one
+        await db.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.user_id == user_id, IdempotencyKey.key == key, IdempotencyKey.expires_at <= now
+            )
+        )
+
+    db.add(
+        IdempotencyKey(
+            user_id=user_id,
+            key=key,
+            fingerprint=fingerprint,
+            status_code=status_code,
+            response_body=response.json(separators=(",", ":")),
+            created_at=now,
+            expires_at=now + timedelta(seconds=IDEMPOTENCY_KEY_TTL),
+        )
+    )
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        replay = await replay_idempotent(db, user_id, key, fingerprint)
+        if replay is None:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still being processed.")
+        return replay
+    return None
@@ -0,0 +1,158 @@
+import math
+from collections import Counter as StatementCounter
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# Minimal Prometheus metrics rendered in the text exposition format at /metrics.
+# Values live in this worker process; scrape each worker (or run a single one) to see them all.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+REGISTRY = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        function: Optional[Callable[[], Dict[tuple, float]]] = None,
+    ):
+        """`function` makes a metric read its values at scrape time: {label values: value}."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self.values: Dict[tuple, float] = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        values = self.function() if self.function else self.values
+        for key, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labelnames, key), value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name}{labels} {_format_value(value)}" for name, labels, value in self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        self.values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        series = self.values.get(key)
+        if series is None:
+            series = self.values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series["counts"][i] += 1
+                break
+        series["sum"] += value
+        series["count"] += 1
+
+    def samples(self):
+        for key, series in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                yield f"{self.name}_bucket", labels, cumulative
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum", labels, series["sum"]
+            yield f"{self.name}_count", labels, series["count"]
+
+
+def render_metrics() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+class RequestStats:
+    """Database work done while serving one request."""
+    __slots__ = ("queries", "db_seconds", "statements")
+
+    def __init__(self, track_statements: bool = False):
+        self.queries = 0
+        self.db_seconds = 0.0
+        # (SQL, parameters) -> times run; only kept when the query budget is enabled
+        self.statements = StatementCounter() if track_statements else None
+
+
+# Set by the metrics middleware for every request, filled in by the engine's cursor events
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+# HTTP metrics, recorded by the middleware in app/main.py
+http_requests_total = Counter(
+    "http_requests_total", "Requests served, by route and status code.", ("method", "route", "status")
+)
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds", "Request latency in seconds, by route.", ("method", "route")
+)
+http_requests_in_progress = Gauge(
+    "http_requests_in_progress", "Requests currently being served."
+)
+http_requests_in_progress.set(0)
+http_request_db_queries = Histogram(
+    "http_request_db_queries", "SQL statements executed per request, by route.", ("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+http_request_db_seconds = Histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per request, by route.", ("method", "route")
+)
+
+# Statement metrics, recorded by the cursor events in app/core/db.py
+db_queries_total = Counter("db_queries_total", "SQL statements executed.")
+db_query_duration_seconds = Histogram("db_query_duration_seconds", "SQL statement latency in seconds.")
+db_pool_checkout_seconds = Histogram(
+    "db_pool_checkout_seconds", "Time to get a connection from the API pool, including waiting for a free one."
+)
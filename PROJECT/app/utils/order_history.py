@@ -0,0 +1,75 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.order import Order
+from app.utils.pagination import encode_cursor, decode_cursor
+
+# Order history is served a page at a time, newest first
+DEFAULT_HISTORY_PAGE_SIZE = 20
+MAX_HISTORY_PAGE_SIZE = 100
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # created_at is stored as naive UTC (datetime.utcnow)
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+async def fetch_order_page(
+    db: AsyncSession,
+    user_id: int,
+    limit: int = DEFAULT_HISTORY_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> dict:
+    """
+    One page of a user's orders ordered by (created_at, id) descending, optionally limited to
+    created_from <= created_at < created_to. Walks the (user_id, created_at, id) index, so a
+    page costs the same however many orders the user has.
+    """
+    created_from, created_to = _naive_utc(created_from), _naive_utc(created_to)
+    if created_from and created_to and created_from >= created_to:
+        raise HTTPException(status_code=400, detail="created_from must be before created_to.")
+
+    query = select(Order.id, Order.product_id, Order.final_amount, Order.created_at).where(Order.user_id == user_id)
+    if created_from:
+        query = query.where(Order.created_at >= created_from)
+    if created_to:
+        query = query.where(Order.created_at < created_to)
+    if cursor:
+        values = decode_cursor(cursor)
+        try:
+            created_at, order_id = datetime.fromisoformat(values[0]), int(values[1])
+        except (ValueError, TypeError, IndexError):
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+        query = query.where(tuple_(Order.created_at, Order.id) < tuple_(created_at, order_id))
+    # Fetch one extra row to know whether another page exists
+    query = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1)
+
+    rows = (await db.execute(query)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor([last.created_at.isoformat(), last.id])
+
+    return {
+        "items": [
+            {
+                "order_id": row.id,
+                "product_id": row.product_id,
+                "final_amount": row.final_amount,
+                "created_at": row.created_at.isoformat(),
+            }
+            for row in rows
+        ],
+        "next_cursor": next_cursor,
+    }
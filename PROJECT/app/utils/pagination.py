@@ -0,0 +1,22 @@
+import base64
+import json
+from typing import Any, List
+
+from fastapi import HTTPException
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Opaque keyset cursor holding the sort key of the last row on a page."""
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return values
@@ -0,0 +1,80 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Iterable, List, NamedTuple, Sequence
+
+from fastapi import HTTPException
+
+# Money is stored as Numeric(12, 2) and computed as Decimal, never as float
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+MIN_ORDER_AMOUNT = Decimal("99")
+MAX_ORDER_AMOUNT = Decimal("4999")
+AMOUNT_LIMIT_DETAIL = "Order amount must be between ₹99 and ₹4,999 after discount."
+
+
+def to_money(value) -> Decimal:
+    """Round a price or amount (Decimal, int, float or str) to paise."""
+    if not isinstance(value, Decimal):
+        # str() first so a float like 19.99 does not drag its binary error along
+        value = Decimal(str(value))
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def offer_discount(amount: Decimal, offer) -> Decimal:
+    """Discount an offer gives on `amount`, capped at the amount itself."""
+    if offer.is_percentage:
+        discount = amount * Decimal(str(offer.discount_value)) / 100
+    else:
+        discount = Decimal(str(offer.discount_value))
+    return min(to_money(discount), amount)
+
+
+class OrderTotals(NamedTuple):
+    quantity: int
+    total_amount: Decimal
+    discount_amount: Decimal
+    final_amount: Decimal
+
+    @property
+    def within_limits(self) -> bool:
+        return MIN_ORDER_AMOUNT <= self.final_amount <= MAX_ORDER_AMOUNT
+
+
+def price_order(lines: Iterable, offer=None, discount=None) -> OrderTotals:
+    """
+    Price one order in a single pass over its lines (OrderItem-like objects with
+    product_id, quantity and unit_price); each line's `line_total` is filled in.
+    The discount comes from `offer`, applied to the lines it covers, or is the fixed
+    `discount` an existing order was already granted. It never exceeds the total.
+    """
+    quantity = 0
+    total = eligible = ZERO
+    for line in lines:
+        line.unit_price = to_money(line.unit_price)
+        line.line_total = line.unit_price * line.quantity
+        quantity += line.quantity
+        total += line.line_total
+        if offer is not None and (not offer.product_id or line.product_id == offer.product_id):
+            eligible += line.line_total
+
+    if offer is not None:
+        discount = offer_discount(eligible, offer)
+    discount = min(to_money(discount or 0), total)
+    return OrderTotals(quantity, total, discount, total - discount)
+
+
+def allocate_discount(line_totals: Sequence[Decimal], discount: Decimal) -> List[Decimal]:
+    """
+    Split an order's discount over its lines in proportion to their totals, for per-product
+    reporting. The shares add up to `discount` exactly; the last line takes the rounding.
+    """
+    total = sum(line_totals, ZERO)
+    if not discount or not total:
+        return [ZERO] * len(line_totals)
+    shares = [to_money(discount * line_total / total) for line_total in line_totals[:-1]]
+    return shares + [to_money(discount) - sum(shares, ZERO)]
+
+
+def check_amount_limits(totals: OrderTotals, detail: str = AMOUNT_LIMIT_DETAIL) -> None:
+    """Reject orders whose final amount is outside ₹99-₹4,999."""
+    if not totals.within_limits:
+        raise HTTPException(status_code=400, detail=detail)
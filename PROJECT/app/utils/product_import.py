@@ -0,0 +1,150 @@
+import codecs
+import csv
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.product import Product, ProductImport
+from app.schemas.product import ProductCreate
+from app.utils.pricing import to_money
+
+# Rows are upserted and committed this many at a time, so memory stays flat for any file size
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+MAX_IMPORT_ERRORS = 100  # rejected rows reported on the import record
+# Longer lines are rejected without being buffered whole (a product row is a few hundred bytes)
+MAX_IMPORT_LINE_LENGTH = int(os.getenv("MAX_IMPORT_LINE_LENGTH", "65536"))
+
+# Content-Type of the upload -> parser
+IMPORT_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[str]]]:
+    """
+    Split a streamed UTF-8 body into (line number, line), holding one chunk at a time.
+    A line over MAX_IMPORT_LINE_LENGTH comes out as (line number, None); its text is dropped
+    as it arrives rather than buffered until the next newline.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    too_long = False  # the line in `pending` is already over the limit
+    line_number = 0
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            line_number += 1
+            yield line_number, None if too_long or len(line) > MAX_IMPORT_LINE_LENGTH else line.rstrip("\r")
+            too_long = False
+        if len(pending) > MAX_IMPORT_LINE_LENGTH:
+            pending, too_long = "", True
+    pending += decoder.decode(b"", final=True)
+    if pending or too_long:
+        yield line_number + 1, None if too_long or len(pending) > MAX_IMPORT_LINE_LENGTH else pending.rstrip("\r")
+
+
+async def iter_records(lines: AsyncIterator[Tuple[int, Optional[str]]], fmt: str) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Yield (line number, record, error) for every non-blank line of a CSV upload
+    (first line is the header, one product per line) or an NDJSON upload.
+    """
+    header = None
+    async for line_number, line in lines:
+        if line is None:
+            yield line_number, None, f"Line is longer than {MAX_IMPORT_LINE_LENGTH} characters."
+            continue
+        if not line.strip():
+            continue
+        if fmt == "csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [column.strip().lower() for column in values]
+                continue
+            if len(values) != len(header):
+                yield line_number, None, f"Expected {len(header)} columns, got {len(values)}."
+                continue
+            yield line_number, dict(zip(header, values)), None
+        else:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_number, None, "Not a JSON object."
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, "Not a JSON object."
+                continue
+            yield line_number, record, None
+
+
+def upsert_products(dialect_name: str, rows: list):
+    """INSERT ... ON CONFLICT (owner_id, name) DO UPDATE for a batch of product rows."""
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    statement = insert(Product).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=[Product.owner_id, Product.name],
+        set_={"price": statement.excluded.price, "stock": statement.excluded.stock},
+    )
+
+
+async def run_product_import(db: AsyncSession, job: ProductImport, fmt: str, chunks: AsyncIterator[bytes]) -> None:
+    """
+    Stream an upload into the owner's catalogue: rows are validated with ProductCreate and
+    upserted IMPORT_BATCH_SIZE at a time, one commit per batch. The import record's
+    counters are updated with every batch so its progress can be followed while it runs,
+    and `job` holds the final figures when this returns.
+    """
+    owner_id = job.owner_id
+    counts = {"rows_read": 0, "rows_imported": 0, "rows_rejected": 0}
+    errors = []
+    batch = {}  # name -> row; a name repeated within a batch keeps its last row
+
+    async def save_progress(**values):
+        for key, value in {**counts, "errors": json.dumps(errors) if errors else None, **values}.items():
+            setattr(job, key, value)
+        await db.commit()
+
+    async def flush():
+        if batch:
+            await db.execute(upsert_products(db.bind.dialect.name, list(batch.values())))
+            counts["rows_imported"] += len(batch)
+            batch.clear()
+        await save_progress()
+
+    try:
+        async for line_number, record, error in iter_records(iter_lines(chunks), fmt):
+            counts["rows_read"] += 1
+            product = None
+            if error is None:
+                try:
+                    product = ProductCreate(**record)
+                except ValidationError as exc:
+                    error = "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors())
+            if error:
+                counts["rows_rejected"] += 1
+                if len(errors) < MAX_IMPORT_ERRORS:
+                    errors.append({"line": line_number, "error": error})
+                continue
+
+            batch[product.name] = {
+                "name": product.name,
+                "price": to_money(product.price),
+                "stock": product.stock,
+                "owner_id": owner_id,
+            }
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await flush()
+        await flush()
+    except Exception:
+        # Batches committed so far stay imported; the record says where it stopped
+        await db.rollback()
+        await save_progress(status="failed", finished_at=datetime.utcnow())
+        raise
+    await save_progress(status="completed", finished_at=datetime.utcnow())
@@ -0,0 +1,37 @@
+import logging
+import os
+from typing import Optional
+
+from app.utils.metrics import RequestStats
+
+# Opt-in SQL query budget for tests and staging. With SQL_QUERY_BUDGET=N every request that
+# issues more than N statements is reported, and statements repeated verbatim (same SQL,
+# same parameters) within one request are logged as likely N+1 loops.
+# SQL_QUERY_BUDGET_MODE=warn only logs; "fail" also turns the response into a 500 so the
+# regression cannot be missed. Leave SQL_QUERY_BUDGET unset (or 0) in production.
+SQL_QUERY_BUDGET = int(os.getenv("SQL_QUERY_BUDGET", "0"))
+SQL_QUERY_BUDGET_MODE = os.getenv("SQL_QUERY_BUDGET_MODE", "warn").strip().lower()
+
+logger = logging.getLogger(__name__)
+
+
+def query_budget_enabled() -> bool:
+    return SQL_QUERY_BUDGET > 0
+
+
+def check_query_budget(stats: RequestStats, route: str) -> Optional[str]:
+    """
+    Log duplicate statements and a blown budget for one request. Returns the error
+    message when the request should fail (fail mode only), otherwise None.
+    """
+    for (statement, parameters), count in stats.statements.items():
+        if count > 1:
+            logger.warning("%s ran the same statement %d times: %s %s", route, count, " ".join(statement.split()), parameters)
+
+    if stats.queries <= SQL_QUERY_BUDGET:
+        return None
+    message = f"{route} issued {stats.queries} SQL statements, over the budget of {SQL_QUERY_BUDGET}"
+    logger.warning(message)
+    if SQL_QUERY_BUDGET_MODE == "fail":
+        return message
+    return None
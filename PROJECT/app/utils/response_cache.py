@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.core.db import REPLICA_STALENESS
+from app.utils.cache import TTLCache
+from app.utils.singleflight import SingleFlight
+
+# Catalogue responses (product listings and detail) are cached for RESPONSE_CACHE_TTL seconds.
+# Every cache key carries a "generation" that is bumped whenever products or stock change,
+# which drops all cached catalogue responses at once. Set RESPONSE_CACHE_URL (redis://...)
+# to share entries and generations between workers; the in-process default only sees its
+# own worker's invalidations, so other workers may serve a page up to the TTL old.
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL")
+
+
+class InProcessBackend:
+    """LRU + TTL entries in this worker's memory."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._generation = 0
+        self._bumped_at = 0.0
+
+    async def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        return self.entries.get(key)
+
+    async def set(self, key: str, value: Tuple[str, bytes]) -> None:
+        self.entries.set(key, value)
+
+    async def generation(self) -> Tuple[int, float]:
+        """Current generation and when it was last bumped (epoch seconds)."""
+        return self._generation, self._bumped_at
+
+    async def bump(self) -> None:
+        self._generation += 1
+        self._bumped_at = time.time()
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "generation": self._generation, **self.entries.stats()}
+
+
+class RedisBackend:
+    """Entries shared by every worker through Redis (needs the `redis` package)."""
+
+    GENERATION_KEY = "response-cache:generation"
+    BUMPED_AT_KEY = "response-cache:bumped-at"
+
+    def __init__(self, url: str, ttl: float):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RESPONSE_CACHE_URL is set but the `redis` package is not installed")
+        self.client = redis.from_url(url)
+        self.ttl = int(ttl)
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        raw = await self.client.get(key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        etag, body = raw.split(b"\n", 1)
+        return etag.decode(), body
+
+    async def set(self, key: str, value: Tuple[str, bytes]) -> None:
+        etag, body = value
+        await self.client.set(key, etag.encode() + b"\n" + body, ex=self.ttl)
+
+    async def generation(self) -> Tuple[int, float]:
+        generation, bumped_at = await self.client.mget(self.GENERATION_KEY, self.BUMPED_AT_KEY)
+        return int(generation or 0), float(bumped_at or 0)
+
+    async def bump(self) -> None:
+        # Old generations are never read again and expire on their own
+        async with self.client.pipeline() as pipe:
+            await pipe.incr(self.GENERATION_KEY).set(self.BUMPED_AT_KEY, time.time()).execute()
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "hits": self.hits, "misses": self.misses}
+
+
+if RESPONSE_CACHE_URL:
+    response_cache = RedisBackend(RESPONSE_CACHE_URL, RESPONSE_CACHE_TTL)
+else:
+    response_cache = InProcessBackend(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+
+# Concurrent misses for the same response (e.g. right after an invalidation) share one build
+catalogue_flight = SingleFlight("catalogue")
+
+
+async def invalidate_catalogue() -> None:
+    """Drop every cached catalogue response; call after products or stock change (after commit)."""
+    await response_cache.bump()
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+async def cached_response(
+    request: Request, build: Callable[[], Awaitable[Any]], scope: str = "", replica: bool = False
+) -> Response:
+    """
+    Serve a catalogue read from the response cache. The key is the path and query string
+    (minus the auth token) plus `scope` for anything else the response depends on, such as
+    the owner. `build` produces the body on a miss. Answers 304 when If-None-Match matches.
+    Pass `replica=True` when `build` reads from a read replica (see reads_from_replica).
+    """
+    params = sorted((k, v) for k, v in request.query_params.multi_items() if k != "token")
+    generation, bumped_at = await response_cache.generation()
+    key = f"catalogue:{generation}:{scope}:{request.url.path}?{params}"
+
+    async def build_entry():
+        body = json.dumps(jsonable_encoder(await build()), separators=(",", ":")).encode()
+        entry = (f'"{hashlib.md5(body).hexdigest()}"', body)
+        # Right after an invalidation a replica may not have the write yet: serve what it has,
+        # but do not keep it for the whole TTL under the new generation
+        if not (replica and time.time() - bumped_at < REPLICA_STALENESS):
+            await response_cache.set(key, entry)
+        return entry
+
+    entry = await response_cache.get(key)
+    if entry is None:
+        entry = await catalogue_flight.do(key, build_entry)
+    etag, body = entry
+
+    # Clients must revalidate, and the token-protected body must not land in shared caches
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
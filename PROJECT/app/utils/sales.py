@@ -0,0 +1,138 @@
+"""
+Per-product daily sales (product_sales_daily), maintained incrementally by the order endpoints.
+
+Every endpoint that changes an order takes the order's contribution before and after the
+change (order_sales) and adds the difference to the summary rows in the same transaction
+(record_sales), with one INSERT ... ON CONFLICT DO UPDATE that increments the counters.
+Owner analytics read the summary instead of scanning orders.
+
+Rebuild the table from the orders with:
+
+    python -m app.utils.sales [--batch-size 5000]
+
+Only orders that exist when the rebuild starts are replayed, newer ones are already counted by
+the endpoints. Changes made during the rebuild to orders it has not reached yet end up counted
+twice, so run it while order traffic is quiet.
+"""
+import argparse
+from datetime import date
+from decimal import Decimal
+from typing import Dict, NamedTuple, Tuple
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.models.order import Order
+from app.models.sales import ProductSalesDaily
+from app.utils.pricing import ZERO, allocate_discount
+
+BACKFILL_BATCH_SIZE = 5000  # orders replayed per transaction
+UPSERT_CHUNK_SIZE = 1000  # summary rows per statement, keeps the bound parameters within driver limits
+
+
+class Sales(NamedTuple):
+    orders: int = 0
+    units: int = 0
+    revenue: Decimal = ZERO
+    discount: Decimal = ZERO
+
+
+def order_sales(order: Order) -> Dict[Tuple[int, date], Sales]:
+    """What one order adds to the summary, per (product_id, day). The discount is split over the lines."""
+    lines = [(item.product_id, item.quantity, item.line_total) for item in order.items]
+    if not lines:
+        # Orders from before order_items existed
+        lines = [(order.product_id, order.quantity, order.total_amount)]
+    discounts = allocate_discount([line_total for _, _, line_total in lines], order.discount_amount or ZERO)
+
+    sales = {}
+    day = order.created_at.date()
+    for (product_id, quantity, line_total), discount in zip(lines, discounts):
+        current = sales.get((product_id, day), Sales())
+        # A product on two lines (bought at two prices) still counts the order once
+        sales[(product_id, day)] = Sales(
+            orders=1,
+            units=current.units + quantity,
+            revenue=current.revenue + line_total - discount,
+            discount=current.discount + discount,
+        )
+    return sales
+
+
+def sales_rows(before: Dict[Tuple[int, date], Sales], after: Dict[Tuple[int, date], Sales]) -> list:
+    """Summary increments turning `before` into `after`, sorted so concurrent writers lock rows in the same order."""
+    rows = []
+    for product_id, day in sorted(set(before) | set(after)):
+        old, new = before.get((product_id, day), Sales()), after.get((product_id, day), Sales())
+        change = Sales(*(n - o for n, o in zip(new, old)))
+        if any(change):
+            rows.append({"product_id": product_id, "day": day, **change._asdict()})
+    return rows
+
+
+def upsert_sales(dialect_name: str, rows: list):
+    """INSERT ... ON CONFLICT (product_id, day) DO UPDATE adding the increments to the stored counters."""
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    statement = insert(ProductSalesDaily).values(rows)
+    table = ProductSalesDaily.__table__.c
+    return statement.on_conflict_do_update(
+        index_elements=[ProductSalesDaily.product_id, ProductSalesDaily.day],
+        set_={
+            column: table[column] + statement.excluded[column]
+            for column in ("orders", "units", "revenue", "discount")
+        },
+    )
+
+
+async def record_sales(
+    db: AsyncSession, before: Dict[Tuple[int, date], Sales], after: Dict[Tuple[int, date], Sales]
+) -> None:
+    """Apply an order change to the summary; call before the order's transaction commits."""
+    rows = sales_rows(before, after)
+    if rows:
+        await db.execute(upsert_sales(db.bind.dialect.name, rows))
+
+
+def backfill_sales(batch_size: int = BACKFILL_BATCH_SIZE) -> None:
+    """Empty the summary and replay every existing order into it, one transaction per batch."""
+    from app.core.db import SessionLocal
+    from app.models import user, owner, product, offer  # noqa: F401  (registers the remaining mappers)
+
+    with SessionLocal() as db:
+        last_id = db.scalar(select(func.max(Order.id))) or 0
+        db.execute(delete(ProductSalesDaily))
+        db.commit()
+
+        done, after_id = 0, 0
+        while after_id < last_id:
+            orders = db.scalars(
+                select(Order)
+                .options(selectinload(Order.items))
+                .where(Order.id > after_id, Order.id <= last_id)
+                .order_by(Order.id)
+                .limit(batch_size)
+            ).all()
+            if not orders:
+                break
+            after_id = orders[-1].id
+            # Add the batch up in memory first, then upsert its rows
+            batch = {}
+            for order in orders:
+                for key, sales in order_sales(order).items():
+                    batch[key] = Sales(*(b + s for b, s in zip(batch.get(key, Sales()), sales)))
+            rows = sales_rows({}, batch)
+            for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+                db.execute(upsert_sales(db.bind.dialect.name, rows[start:start + UPSERT_CHUNK_SIZE]))
+            db.commit()
+
+            done += len(orders)
+            db.expunge_all()
+            print(f"{done} orders replayed (up to id {after_id} of {last_id})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild product_sales_daily from the orders.")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+    backfill_sales(parser.parse_args().batch_size)
@@ -0,0 +1,88 @@
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from app.utils.metrics import Counter, Gauge
+
+# Request coalescing: while a read is running, identical reads (same key) arriving in the
+# same worker wait for it and share its result - or its exception - instead of sending the
+# same query again. Meant for hot, read-only lookups such as a catalogue page right after
+# its cache entry expired; never put writes or per-user results behind a shared key.
+
+singleflight_calls_total = Counter(
+    "singleflight_calls_total",
+    "Coalesced reads, by flight: 'leader' calls ran the read, 'coalesced' ones shared a running call.",
+    ("flight", "role"),
+)
+
+FLIGHTS = []
+Gauge(
+    "singleflight_in_flight", "Reads currently running, by flight.", ("flight",),
+    function=lambda: {(flight.name,): len(flight) for flight in FLIGHTS},
+)
+
+
+def default_key(*args, **kwargs) -> Hashable:
+    return args, tuple(sorted(kwargs.items()))
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent callers with the same key get the
+    running call's result. `key` turns the arguments of `call` into that key (by default all
+    of them); leave out anything that differs per request but does not change the result,
+    such as the database session.
+    """
+
+    def __init__(self, name: str, key: Callable[..., Hashable] = default_key):
+        self.name = name
+        self.key = key
+        self.leaders = 0
+        self.coalesced = 0
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        FLIGHTS.append(self)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await `fn()`, or the call already running under `key`."""
+        while key in self._calls:
+            future = self._calls[key]
+            self.coalesced += 1
+            singleflight_calls_total.inc(flight=self.name, role="coalesced")
+            try:
+                # shield: a caller that is cancelled must not cancel the call the others share
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The leader was cancelled (e.g. its client went away); run the read ourselves
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.leaders += 1
+        singleflight_calls_total.inc(flight=self.name, role="leader")
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # retrieved, so a call nobody shared is not logged as unhandled
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    async def call(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Await `fn(*args, **kwargs)`, coalesced on `self.key(*args, **kwargs)`."""
+        return await self.do(self.key(*args, **kwargs), functools.partial(fn, *args, **kwargs))
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._calls), "leaders": self.leaders, "coalesced": self.coalesced}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
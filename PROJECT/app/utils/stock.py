@@ -0,0 +1,37 @@
+from fastapi import HTTPException
+from sqlalchemy import update, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.product import Product
+
+
+async def reserve_stock(db: AsyncSession, product_id: int, quantity: int):
+    """
+    Take `quantity` units of a product in one conditional UPDATE ... RETURNING.
+    The row lock is held until the caller's transaction ends, so the stock check
+    and the decrement cannot interleave with another checkout. Returns the
+    product's (id, price, stock) after the decrement.
+    """
+    result = await db.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.stock >= quantity)
+        .values(stock=Product.stock - quantity)
+        .returning(Product.id, Product.price, Product.stock)
+    )
+    row = result.first()
+    if row is None:
+        # Nothing updated: tell "no such product" apart from "not enough stock"
+        exists = await db.scalar(select(Product.id).where(Product.id == product_id))
+        if exists is None:
+            raise HTTPException(status_code=404, detail="Product not found.")
+        raise HTTPException(status_code=400, detail="Entered quantity is not available in stock.")
+    return row
+
+
+async def release_stock(db: AsyncSession, product_id: int, quantity: int) -> None:
+    """Put `quantity` units back, e.g. when an order is deleted or shrinks."""
+    await db.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(stock=Product.stock + quantity)
+    )
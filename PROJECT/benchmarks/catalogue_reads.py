@@ -0,0 +1,216 @@
+"""
+Catalogue read benchmark.
+
+Seeds a `--products` product table (100,000 by default) and reads it the way the API does,
+comparing the ORM path the listings used to take with the column projection they use now:
+
+  listing  every page of GET /order/get_product (keyset, `--page-size` rows per page), from the
+           query to the JSON body the response cache stores
+  detail   `--lookups` random GET /order/product/{id} bodies
+
+    orm          select(Product) objects (load_only for the listing), then the pydantic
+                 response models, as before
+    projection   select(Product.id, Product.name, ...) rows turned straight into dicts
+
+Run from the PROJECT directory with the dev packages installed (`pipenv install --dev`):
+
+    python benchmarks/catalogue_reads.py
+    python benchmarks/catalogue_reads.py --database-url postgresql://user:pw@localhost/bench
+
+Use a throwaway database: it is migrated to head and seeded, and the SQLite default is
+recreated on every run. Compare the two paths within one run; absolute numbers depend on
+the machine and the database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(HERE)
+DEFAULT_DATABASE_URL = "sqlite:///" + os.path.join(tempfile.gettempdir(), "catalogue_bench.db")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per path, the best one is reported")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def prepare_database(args):
+    """Point the app at the benchmark database and migrate it; must run before `app` is imported."""
+    if args.database_url.startswith("sqlite:///"):
+        path = args.database_url[len("sqlite:///"):]
+        if os.path.exists(path):
+            os.remove(path)
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.pop("DATABASE_REPLICA_URLS", None)
+    sys.path.insert(0, PROJECT_DIR)
+    os.chdir(PROJECT_DIR)
+
+    from alembic import command
+    from alembic.config import Config
+    command.upgrade(Config(os.path.join(PROJECT_DIR, "alembic.ini")), "head")
+
+
+def seed(args, rng: random.Random):
+    """One owner and `--products` products, inserted in executemany batches."""
+    from sqlalchemy import insert
+    from app.core.db import SessionLocal
+    from app.models.owner import Owner
+    from app.models.product import Product
+    from app.models import user, order, offer  # noqa: F401  (registers the remaining mappers)
+
+    run_id = str(int(time.time()))[-6:]
+    with SessionLocal() as db:
+        owner = Owner(ownername=f"bench-{run_id}-owner", password="-")
+        db.add(owner)
+        db.flush()
+        for start in range(0, args.products, 10_000):
+            db.execute(
+                insert(Product),
+                [
+                    {
+                        "name": f"bench-{run_id}-product-{i:06d}",
+                        "price": Decimal(rng.randint(2000, 90000)) / 100,
+                        "stock": rng.randint(0, 500),
+                        "owner_id": owner.id,
+                    }
+                    for i in range(start, min(start + 10_000, args.products))
+                ],
+            )
+        db.commit()
+        ids = [row.id for row in db.execute(Product.__table__.select().with_only_columns(Product.id))]
+    return ids
+
+
+def body(value) -> bytes:
+    """What cached_response does with a built response."""
+    from fastapi.encoders import jsonable_encoder
+    return json.dumps(jsonable_encoder(value), separators=(",", ":")).encode()
+
+
+async def orm_listing_page(db, limit, cursor):
+    """The listing before: Product objects with load_only, validated through ProductPage."""
+    from sqlalchemy import select
+    from sqlalchemy.orm import load_only
+    from app.models.product import Product
+    from app.schemas.product import ProductPage
+    from app.utils.catalogue import PRODUCT_FIELDS
+    from app.utils.pagination import encode_cursor, decode_cursor
+
+    query = select(Product).options(load_only(*(getattr(Product, c) for c in PRODUCT_FIELDS)))
+    if cursor:
+        query = query.where(Product.id > decode_cursor(cursor)[1])
+    products = (await db.scalars(query.order_by(Product.id).limit(limit + 1))).all()
+    has_more = len(products) > limit
+    products = products[:limit]
+    page = {
+        "items": [{c: getattr(product, c) for c in PRODUCT_FIELDS} for product in products],
+        "next_cursor": encode_cursor(["id", products[-1].id]) if has_more else None,
+    }
+    return ProductPage(**page).dict(exclude_none=True)
+
+
+async def projection_listing_page(db, limit, cursor):
+    from app.utils.catalogue import fetch_product_page
+    return await fetch_product_page(db, limit=limit, cursor=cursor)
+
+
+async def orm_detail(db, product_id):
+    """The detail before: the full Product object through ProductResponse."""
+    from app.models.product import Product
+    from app.schemas.product import ProductResponse
+    return ProductResponse.from_orm(await db.get(Product, product_id))
+
+
+async def projection_detail(db, product_id):
+    from sqlalchemy import select
+    from app.models.product import Product
+    row = (
+        await db.execute(select(Product.name, Product.price, Product.stock, Product.id).where(Product.id == product_id))
+    ).first()
+    return dict(row._mapping)
+
+
+async def read_catalogue(fetch_page, page_size) -> int:
+    """Every page of the listing, each in its own session like a request; returns the rows read."""
+    from app.core.db import AsyncSessionLocal
+    rows, cursor = 0, None
+    while True:
+        async with AsyncSessionLocal() as db:
+            page = await fetch_page(db, page_size, cursor)
+        body(page)
+        rows += len(page["items"])
+        cursor = page.get("next_cursor")
+        if not cursor:
+            return rows
+
+
+async def read_details(fetch_detail, ids) -> int:
+    from app.core.db import AsyncSessionLocal
+    for product_id in ids:
+        async with AsyncSessionLocal() as db:
+            body(await fetch_detail(db, product_id))
+    return len(ids)
+
+
+async def best_of(repeat, run):
+    """Fastest of `repeat` runs: (items, seconds)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = await run()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[1]:
+            best = (count, elapsed)
+    return best
+
+
+async def run(args, ids, rng):
+    from app.core.db import async_engine
+    lookups = [rng.choice(ids) for _ in range(args.lookups)]
+    results = {}
+    try:
+        for label, fetch_page in (("orm", orm_listing_page), ("projection", projection_listing_page)):
+            results[("listing", label)] = await best_of(args.repeat, lambda: read_catalogue(fetch_page, args.page_size))
+        for label, fetch_detail in (("orm", orm_detail), ("projection", projection_detail)):
+            results[("detail", label)] = await best_of(args.repeat, lambda: read_details(fetch_detail, lookups))
+    finally:
+        await async_engine.dispose()
+    return results
+
+
+def print_report(args, results):
+    print(f"\n{args.products} products, {args.database_url.split(':', 1)[0]}, best of {args.repeat}\n")
+    print(f"{'path':10} {'query':12} {'items':>8} {'seconds':>8} {'items/s':>10}")
+    for (path, label), (count, elapsed) in results.items():
+        print(f"{path:10} {label:12} {count:>8} {elapsed:>8.2f} {count / elapsed:>10.0f}")
+    for path in ("listing", "detail"):
+        before, after = results[(path, "orm")], results[(path, "projection")]
+        speedup = (after[0] / after[1]) / (before[0] / before[1])
+        print(f"{path}: projection is {speedup:.2f}x the ORM throughput")
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    prepare_database(args)
+    ids = seed(args, rng)
+    results = asyncio.run(run(args, ids, rng))
+    print_report(args, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Order-flow benchmark.
+
+Seeds a database with an owner, products and offers, then drives virtual users through
+register -> login -> list products -> create order -> update order -> delete order against
+the app in-process (httpx ASGITransport, no server or network involved), and reports
+throughput and latency percentiles per endpoint.
+
+Run from the PROJECT directory with the dev packages installed (`pipenv install --dev`):
+
+    python benchmarks/order_flow.py                    # SQLite stand-in, compared with baseline.json
+    python benchmarks/order_flow.py --save-baseline    # record a new baseline
+    python benchmarks/order_flow.py --database-url postgresql://user:pw@localhost/bench --users 200 --concurrency 50
+
+Use a throwaway database: it is migrated to head and seeded, and the SQLite default is
+recreated on every run. Numbers only compare across runs on the same machine and database,
+so record your own baseline before comparing.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(HERE)
+DEFAULT_DATABASE_URL = "sqlite:///" + os.path.join(tempfile.gettempdir(), "order_flow_bench.db")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--users", type=int, default=50, help="virtual users, each runs the whole flow")
+    parser.add_argument("--concurrency", type=int, default=10, help="virtual users running at the same time")
+    parser.add_argument("--rounds", type=int, default=3, help="list/create/update/delete rounds per user")
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--offers", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42, help="random seed, keeps the workload reproducible")
+    parser.add_argument("--baseline", default=os.path.join(HERE, "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50/p99 slowdown before failing (0.25 = 25%%)")
+    return parser.parse_args()
+
+
+def prepare_database(args):
+    """Point the app at the benchmark database and migrate it; must run before `app` is imported."""
+    if args.database_url.startswith("sqlite:///"):
+        path = args.database_url[len("sqlite:///"):]
+        if os.path.exists(path):
+            os.remove(path)
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    sys.path.insert(0, PROJECT_DIR)
+    os.chdir(PROJECT_DIR)
+
+    from alembic import command
+    from alembic.config import Config
+    command.upgrade(Config(os.path.join(PROJECT_DIR, "alembic.ini")), "head")
+
+
+def seed(args, run_id: str, rng: random.Random):
+    """One owner, `--products` products with plenty of stock and `--offers` product offers."""
+    from app.core.db import SessionLocal
+    from app.core.auth import pwd_context
+    from app.models.owner import Owner
+    from app.models.product import Product
+    from app.models.offer import Offer
+    from app.models import user, order  # noqa: F401  (registers the remaining mappers)
+
+    with SessionLocal() as db:
+        owner = Owner(ownername=f"bench-{run_id}-owner", password=pwd_context.hash("bench"))
+        db.add(owner)
+        db.flush()
+        products = [
+            Product(
+                name=f"bench-{run_id}-product-{i}",
+                price=Decimal(rng.randint(2000, 90000)) / 100,
+                stock=1_000_000,
+                owner_id=owner.id,
+            )
+            for i in range(args.products)
+        ]
+        db.add_all(products)
+        db.flush()
+        offers = [
+            Offer(
+                code=f"B{run_id}{i}"[:20],
+                discount_value=rng.choice([5, 10, 15, 20]),
+                is_percentage=True,
+                expiry_date=datetime.utcnow() + timedelta(days=30),
+                product_id=products[i % len(products)].id,
+                owner_id=owner.id,
+            )
+            for i in range(args.offers)
+        ]
+        db.add_all(offers)
+        db.commit()
+        return (
+            [(product.id, float(product.price)) for product in products],
+            {offer.product_id: offer.code for offer in offers},
+        )
+
+
+class Recorder:
+    """Latencies and failures per endpoint."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, client, label, method, url, expect=200, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[label].append(time.perf_counter() - start)
+        if response.status_code != expect:
+            self.errors[label] += 1
+            raise RuntimeError(f"{label} answered {response.status_code}: {response.text[:200]}")
+        return response
+
+
+async def virtual_user(client, recorder, args, run_id, number, products, offers, rng):
+    credentials = {"username": f"bench-{run_id}-user-{number}", "password": "bench-password"}
+    await recorder.call(client, "POST /user/register", "POST", "/user/register", json=credentials)
+    login = await recorder.call(client, "POST /user/login", "POST", "/user/login", json=credentials)
+    token = {"token": login.json()["access_token"]}
+
+    for _ in range(args.rounds):
+        await recorder.call(
+            client, "GET /order/get_product", "GET", "/order/get_product", params={**token, "limit": 50}
+        )
+        # Enough units to land inside the 99-4,999 order limits, with or without an offer
+        product_id, price = rng.choice(products)
+        quantity = max(1, int(150 // price) + 1)
+        order = {"product_id": product_id, "quantity": quantity}
+        if product_id in offers and rng.random() < 0.5:
+            order["offer_code"] = offers[product_id]
+        created = await recorder.call(client, "POST /order/order", "POST", "/order/order", params=token, json=order)
+        order_id = created.json()["order_id"]
+        await recorder.call(
+            client, "PUT /order/order/{order_id}", "PUT", f"/order/order/{order_id}",
+            params=token, json={"product_id": product_id, "quantity": quantity + 1},
+        )
+        await recorder.call(
+            client, "DELETE /order/order/{order_id}", "DELETE", f"/order/order/{order_id}", params=token, expect=204
+        )
+
+
+async def run(args, run_id, products, offers):
+    import httpx
+    from app.main import app
+    import app.routes.order as order_routes
+
+    # Orders are refused on Sundays and public holidays; the benchmark must run any day
+    order_routes.is_public_holiday_or_sunday = lambda *a, **k: False
+
+    recorder = Recorder()
+    queue = asyncio.Queue()
+    for number in range(args.users):
+        queue.put_nowait(number)
+    failures = []
+
+    async def worker(worker_number):
+        rng = random.Random(args.seed * 1000 + worker_number)
+        while not queue.empty():
+            number = queue.get_nowait()
+            try:
+                await virtual_user(client, recorder, args, run_id, number, products, offers, rng)
+            except RuntimeError as exc:
+                failures.append(str(exc))
+
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(n) for n in range(args.concurrency)))
+            elapsed = time.perf_counter() - start
+    finally:
+        await app.router.shutdown()
+    return recorder, elapsed, failures
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarise(args, recorder, elapsed):
+    endpoints = {}
+    for label, values in recorder.latencies.items():
+        endpoints[label] = {
+            "count": len(values),
+            "errors": recorder.errors[label],
+            "rps": round(len(values) / elapsed, 1),
+            "mean_ms": round(statistics.mean(values) * 1000, 2),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p90_ms": round(percentile(values, 90) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+        }
+    total = sum(len(values) for values in recorder.latencies.values())
+    return {
+        "config": {
+            "database": args.database_url.split(":", 1)[0],
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "rounds": args.rounds,
+            "products": args.products,
+        },
+        # Informational only: the interpreter varies between machines and is not part of the match
+        "python": platform.python_version(),
+        "elapsed_s": round(elapsed, 2),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 1),
+        "flows_per_s": round(args.users / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+
+def print_report(summary):
+    print(f"\n{summary['requests']} requests in {summary['elapsed_s']}s: "
+          f"{summary['throughput_rps']} req/s, {summary['flows_per_s']} user flows/s\n")
+    print(f"{'endpoint':34} {'count':>6} {'err':>4} {'req/s':>7} {'mean':>8} {'p50':>8} {'p90':>8} {'p99':>8}  (ms)")
+    for label, stats in summary["endpoints"].items():
+        print(f"{label:34} {stats['count']:>6} {stats['errors']:>4} {stats['rps']:>7} "
+              f"{stats['mean_ms']:>8} {stats['p50_ms']:>8} {stats['p90_ms']:>8} {stats['p99_ms']:>8}")
+
+
+def compare(summary, baseline, tolerance) -> bool:
+    """Print the change against the baseline; False when an endpoint got slower than allowed."""
+    if baseline["config"] != summary["config"]:
+        print(f"\nBaseline was recorded with a different setup ({baseline['config']}); not comparing.")
+        return True
+    if baseline.get("python") != summary["python"]:
+        print(f"\nNote: baseline was recorded on Python {baseline.get('python', 'unknown')}, this run is {summary['python']}.")
+    print(f"\nAgainst baseline (tolerance {tolerance:.0%}):")
+    ok = True
+    for label, stats in summary["endpoints"].items():
+        before = baseline["endpoints"].get(label)
+        if not before:
+            continue
+        changes = []
+        for key in ("p50_ms", "p99_ms"):
+            change = (stats[key] - before[key]) / before[key] if before[key] else 0.0
+            changes.append(f"{key[:3]} {before[key]} -> {stats[key]} ({change:+.0%})")
+            if change > tolerance:
+                ok = False
+                changes[-1] += " SLOWER"
+        print(f"  {label:34} " + ", ".join(changes))
+    return ok
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    run_id = str(int(time.time()))[-6:]
+
+    prepare_database(args)
+    products, offers = seed(args, run_id, rng)
+    recorder, elapsed, failures = asyncio.run(run(args, run_id, products, offers))
+
+    summary = summarise(args, recorder, elapsed)
+    print_report(summary)
+    for failure in failures[:10]:
+        print("failed flow:", failure)
+
+    ok = not failures
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(summary, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            ok = compare(summary, json.load(f), args.tolerance) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
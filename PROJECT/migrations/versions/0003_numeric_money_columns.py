@@ -0,0 +1,57 @@
+"""numeric money columns
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 11:02:14.512907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table -> [(column, nullable)] holding money
+MONEY_COLUMNS = {
+    'products': [('price', False)],
+    'offers': [('discount_value', False)],
+    'orders': [('total_amount', False), ('discount_amount', True), ('final_amount', False)],
+    'order_items': [('unit_price', False), ('line_total', False)],
+}
+
+
+def upgrade() -> None:
+    # Existing float values are rounded to paise while converting
+    # (Postgres through USING, SQLite has no cast so round the stored values first)
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    for table, columns in MONEY_COLUMNS.items():
+        if sqlite:
+            for column, _ in columns:
+                op.execute(f'UPDATE {table} SET {column} = ROUND({column}, 2)')
+        with op.batch_alter_table(table) as batch_op:
+            for column, nullable in columns:
+                batch_op.alter_column(
+                    column,
+                    existing_type=sa.Float(),
+                    type_=sa.Numeric(12, 2),
+                    existing_nullable=nullable,
+                    postgresql_using=f'round({column}::numeric, 2)',
+                )
+
+
+def downgrade() -> None:
+    for table, columns in MONEY_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for column, nullable in columns:
+                batch_op.alter_column(
+                    column,
+                    existing_type=sa.Numeric(12, 2),
+                    type_=sa.Float(),
+                    existing_nullable=nullable,
+                )
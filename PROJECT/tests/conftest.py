@@ -0,0 +1,48 @@
+"""
+Tests run against a throwaway SQLite database migrated to head, the way benchmarks/order_flow.py
+does it. Run `pytest` from the PROJECT directory with the dev packages installed.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DATABASE = os.path.join(tempfile.gettempdir(), "grocery_tests.db")
+
+# Must happen before anything imports `app`, the engines are created from DATABASE_URL at import
+os.environ["DATABASE_URL"] = "sqlite:///" + TEST_DATABASE
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+sys.path.insert(0, PROJECT_DIR)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    from alembic import command
+    from alembic.config import Config
+
+    if os.path.exists(TEST_DATABASE):
+        os.remove(TEST_DATABASE)
+    command.upgrade(Config(os.path.join(PROJECT_DIR, "alembic.ini")), "head")
+    yield
+    os.remove(TEST_DATABASE)
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine to completion; the API engine's connections are dropped after each test's loop."""
+    from app.core.db import async_engine
+
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await async_engine.dispose()
+
+        return asyncio.run(main())
+
+    return run
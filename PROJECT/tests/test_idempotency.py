@@ -0,0 +1,159 @@
+import json
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import select
+from starlette.requests import Request
+
+from app.core.db import AsyncSessionLocal
+from app.models import order, idempotency  # noqa: F401  (registers the remaining mappers)
+from app.models.idempotency import IdempotencyKey
+from app.models.user import User
+from app.utils.idempotency import request_fingerprint, replay_idempotent, store_idempotent
+
+
+class OrderOut(BaseModel):
+    id: int
+    final_amount: str
+
+
+def make_request(body: bytes, query: bytes = b"", method: str = "POST", path: str = "/create_order"):
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    scope = {"type": "http", "method": method, "path": path, "query_string": query, "headers": []}
+    return Request(scope, receive)
+
+
+async def add_user() -> int:
+    async with AsyncSessionLocal() as db:
+        user = User(username=f"user-{uuid.uuid4().hex}", password="x")
+        db.add(user)
+        await db.commit()
+        return user.id
+
+
+def test_fingerprint_ignores_the_token_but_not_the_body(run):
+    async def scenario():
+        body = b'{"product_id": 1, "quantity": 3}'
+        first = await request_fingerprint(make_request(body, b"token=aaa&offer_code=X"))
+        retry = await request_fingerprint(make_request(body, b"offer_code=X&token=bbb"))
+        other_body = await request_fingerprint(make_request(b'{"product_id": 1, "quantity": 4}', b"offer_code=X"))
+        other_path = await request_fingerprint(make_request(body, b"offer_code=X", path="/update_order/1"))
+        return first, retry, other_body, other_path
+
+    first, retry, other_body, other_path = run(scenario())
+    assert first == retry
+    assert len({first, other_body, other_path}) == 3
+
+
+def test_stored_response_is_replayed(run):
+    async def scenario():
+        user_id = await add_user()
+        async with AsyncSessionLocal() as db:
+            assert await replay_idempotent(db, user_id, "key-1", "f" * 64) is None
+            stored = await store_idempotent(db, user_id, "key-1", "f" * 64, OrderOut(id=7, final_amount="150.00"))
+            assert stored is None  # the first request answers normally
+            await db.commit()
+
+        async with AsyncSessionLocal() as db:
+            return await replay_idempotent(db, user_id, "key-1", "f" * 64)
+
+    replay = run(scenario())
+    assert replay.status_code == 200
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert json.loads(replay.body) == {"id": 7, "final_amount": "150.00"}
+
+
+def test_reused_key_with_a_different_request_is_rejected(run):
+    async def scenario():
+        user_id = await add_user()
+        async with AsyncSessionLocal() as db:
+            await store_idempotent(db, user_id, "key-1", "a" * 64, OrderOut(id=1, final_amount="99.00"))
+            await db.commit()
+
+        async with AsyncSessionLocal() as db:
+            await replay_idempotent(db, user_id, "key-1", "b" * 64)
+
+    with pytest.raises(HTTPException) as error:
+        run(scenario())
+    assert error.value.status_code == 422
+
+
+def test_keys_are_per_user(run):
+    async def scenario():
+        owner_id, other_id = await add_user(), await add_user()
+        async with AsyncSessionLocal() as db:
+            await store_idempotent(db, owner_id, "key-1", "a" * 64, OrderOut(id=1, final_amount="99.00"))
+            await db.commit()
+
+        async with AsyncSessionLocal() as db:
+            return await replay_idempotent(db, other_id, "key-1", "b" * 64)
+
+    assert run(scenario()) is None
+
+
+def test_expired_key_runs_the_request_again(run):
+    async def scenario():
+        user_id = await add_user()
+        async with AsyncSessionLocal() as db:
+            await store_idempotent(db, user_id, "key-1", "a" * 64, OrderOut(id=1, final_amount="99.00"))
+            await db.commit()
+            stored = await db.scalar(select(IdempotencyKey).where(IdempotencyKey.user_id == user_id))
+            stored.expires_at = datetime.utcnow() - timedelta(seconds=1)
+            await db.commit()
+
+        async with AsyncSessionLocal() as db:
+            assert await replay_idempotent(db, user_id, "key-1", "b" * 64) is None
+            # The expired entry is replaced instead of blocking the new one
+            assert await store_idempotent(db, user_id, "key-1", "b" * 64, OrderOut(id=2, final_amount="120.00")) is None
+            await db.commit()
+            return await replay_idempotent(db, user_id, "key-1", "b" * 64)
+
+    assert json.loads(run(scenario()).body) == {"id": 2, "final_amount": "120.00"}
+
+
+def test_concurrent_retry_gets_the_winners_response(run):
+    async def scenario():
+        user_id = await add_user()
+        async with AsyncSessionLocal() as first, AsyncSessionLocal() as retry:
+            # Both requests find no stored response and run
+            assert await replay_idempotent(first, user_id, "key-1", "f" * 64) is None
+            assert await replay_idempotent(retry, user_id, "key-1", "f" * 64) is None
+            retry_user = await retry.get(User, user_id)
+            retry_user.username = f"changed-{uuid.uuid4().hex}"  # stands in for the retry's own writes
+
+            assert await store_idempotent(first, user_id, "key-1", "f" * 64, OrderOut(id=1, final_amount="150.00")) is None
+            await first.commit()
+
+            # The retry hits the unique key, its transaction is rolled back and it answers with the winner's response
+            replay = await store_idempotent(retry, user_id, "key-1", "f" * 64, OrderOut(id=2, final_amount="150.00"))
+            await retry.commit()
+
+        async with AsyncSessionLocal() as db:
+            username = (await db.get(User, user_id)).username
+            count = len((await db.scalars(select(IdempotencyKey).where(IdempotencyKey.user_id == user_id))).all())
+        return replay, username, count
+
+    replay, username, count = run(scenario())
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert json.loads(replay.body) == {"id": 1, "final_amount": "150.00"}
+    assert username.startswith("user-")  # the retry's writes were rolled back
+    assert count == 1
+
+
+def test_concurrent_retry_with_a_different_request_is_rejected(run):
+    async def scenario():
+        user_id = await add_user()
+        async with AsyncSessionLocal() as first, AsyncSessionLocal() as retry:
+            assert await replay_idempotent(retry, user_id, "key-1", "b" * 64) is None
+            await store_idempotent(first, user_id, "key-1", "a" * 64, OrderOut(id=1, final_amount="150.00"))
+            await first.commit()
+            await store_idempotent(retry, user_id, "key-1", "b" * 64, OrderOut(id=2, final_amount="150.00"))
+
+    with pytest.raises(HTTPException) as error:
+        run(scenario())
+    assert error.value.status_code == 422
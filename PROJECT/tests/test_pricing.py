@@ -0,0 +1,85 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils.pricing import allocate_discount, check_amount_limits, offer_discount, price_order, to_money
+
+
+def line(product_id, quantity, unit_price):
+    return SimpleNamespace(product_id=product_id, quantity=quantity, unit_price=unit_price)
+
+
+def offer(discount_value, is_percentage=True, product_id=None):
+    return SimpleNamespace(discount_value=discount_value, is_percentage=is_percentage, product_id=product_id)
+
+
+def test_to_money_rounds_half_up_without_float_error():
+    assert to_money(19.99) == Decimal("19.99")
+    assert to_money("0.125") == Decimal("0.13")
+    assert to_money(Decimal("2.675")) == Decimal("2.68")  # float 2.675 would round down
+    assert to_money(5) == Decimal("5.00")
+
+
+def test_price_order_without_offer():
+    lines = [line(1, 3, 19.99), line(2, 2, Decimal("12.5"))]
+    totals = price_order(lines)
+    assert [item.line_total for item in lines] == [Decimal("59.97"), Decimal("25.00")]
+    assert totals == (5, Decimal("84.97"), Decimal("0.00"), Decimal("84.97"))
+
+
+def test_percentage_offer_only_discounts_its_product():
+    lines = [line(1, 1, "33.35"), line(2, 2, "100.00")]
+    totals = price_order(lines, offer=offer(10, product_id=1))
+    # 10% of 33.35 is 3.335, rounded half up
+    assert totals.discount_amount == Decimal("3.34")
+    assert totals.final_amount == Decimal("230.01")
+
+
+def test_offer_without_product_covers_every_line():
+    totals = price_order([line(1, 1, "33.35"), line(2, 2, "100.00")], offer=offer(10))
+    assert totals.discount_amount == Decimal("23.34")  # 10% of 233.35
+    assert totals.total_amount - totals.discount_amount == totals.final_amount
+
+
+def test_flat_offer_is_capped_at_the_eligible_amount():
+    totals = price_order([line(1, 1, "40.00"), line(2, 1, "80.00")], offer=offer(50, is_percentage=False, product_id=1))
+    assert totals.discount_amount == Decimal("40.00")
+    assert totals.final_amount == Decimal("80.00")
+
+
+def test_granted_discount_is_kept_and_capped_at_the_total():
+    lines = [line(1, 4, "25.00")]
+    assert price_order(lines, discount=Decimal("12.345")).discount_amount == Decimal("12.35")
+    assert price_order(lines, discount=Decimal("500")).final_amount == Decimal("0.00")
+    assert offer_discount(Decimal("10.00"), offer(150)) == Decimal("10.00")
+
+
+def test_allocated_shares_add_up_to_the_discount():
+    shares = allocate_discount([Decimal("10.00")] * 3, Decimal("10.00"))
+    assert shares == [Decimal("3.33"), Decimal("3.33"), Decimal("3.34")]  # the last line takes the rounding
+
+    totals = [Decimal("59.97"), Decimal("25.00"), Decimal("0.01"), Decimal("133.33")]
+    shares = allocate_discount(totals, Decimal("21.83"))
+    assert sum(shares) == Decimal("21.83")
+    assert all(share >= 0 for share in shares)
+    assert shares[0] == to_money(Decimal("21.83") * Decimal("59.97") / sum(totals))
+
+
+def test_nothing_to_allocate():
+    assert allocate_discount([Decimal("10.00"), Decimal("5.00")], Decimal("0.00")) == [Decimal("0.00")] * 2
+    assert allocate_discount([Decimal("0.00")], Decimal("5.00")) == [Decimal("0.00")]
+    assert allocate_discount([], Decimal("5.00")) == []
+
+
+@pytest.mark.parametrize("amount, allowed", [("98.99", False), ("99.00", True), ("4999.00", True), ("4999.01", False)])
+def test_amount_limits(amount, allowed):
+    totals = price_order([line(1, 1, amount)])
+    assert totals.within_limits is allowed
+    if allowed:
+        check_amount_limits(totals)
+    else:
+        with pytest.raises(HTTPException) as error:
+            check_amount_limits(totals)
+        assert error.value.status_code == 400